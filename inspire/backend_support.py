@@ -1,18 +1,38 @@
+import copy
+import gc
+import hashlib
+import heapq
+import inspect
+import itertools
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from .libs import common
 import sys
 
+import comfy.lora
+import comfy.model_management
+import comfy.sd
+import comfy.utils
 import folder_paths
 import nodes
+import torch
 from server import PromptServer
 
-from .libs.utils import TaggedCache, any_typ
+from .libs.utils import (TaggedCache, any_typ, format_byte_size, get_memory_usage, host_weight_dtypes, namespace_key, namespace_separator,
+                         parse_byte_size, parse_priority_class, split_memory_usage, split_namespace_key, weight_dtype_options)
+from .libs import weight_daemon
+from .libs.weight_dedup import iter_modules
+from .libs.key_prediction import KeySequencePredictor
 
 import logging
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 settings_file = os.path.join(root_dir, 'cache_settings.json')
+manifest_file = os.path.join(root_dir, 'cache_manifest.json')
 try:
     with open(settings_file) as f:
         cache_settings = json.load(f)
@@ -20,27 +40,1042 @@ except Exception as e:
     logging.error(e)
     cache_settings = {}
 cache = TaggedCache(cache_settings)
-cache_count = {}
+cache_count = cache.get_persisted_versions()  # keeps IS_CHANGED of persisted keys stable across restarts
+cache_lock = threading.RLock()  # guards `cache` replacement and `cache_count`
 
+loading_futures = {}  # key -> Future of an in-flight `load_shared`
+loading_lock = threading.Lock()
 
-def update_cache(k, tag, v):
-    cache[k] = (tag, v)
-    cnt = cache_count.get(k)
-    if cnt is None:
-        cnt = 0
+load_latency_buckets = [0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+load_latency = {}  # loader name -> {"buckets": [n per bucket], "sum": seconds, "count": n}
+metrics_lock = threading.Lock()
+
+
+namespace_context = threading.local()  # "namespace" of the background workers of this pack (preload, prefetch, ...)
+prompt_namespace_cache = [None, '']  # [prompt id, namespace] of the last running prompt
+prompt_worker = [None]  # thread ident of ComfyUI's prompt worker, recorded by the prompt queue hook
+
+
+def resolve_namespace(prompt, extra_data):
+    """
+    Cache namespace of a prompt: the 'Cache Namespace' node of the prompt, the "namespace_field" of its extra_data
+    (default: "cache_namespace"), or its client id if "namespace_from_client_id" is set. '' is the default namespace.
+    """
+    namespace = None
+    for node in prompt.values():
+        if node.get('class_type') == "CacheNamespace //Inspire" and isinstance(node.get('inputs', {}).get('namespace'), str):
+            namespace = node['inputs']['namespace']
+            break
+
+    if not namespace:
+        namespace = extra_data.get(cache._tag_option('*', 'namespace_field', 'cache_namespace'))
+    if not namespace and cache._tag_option('*', 'namespace_from_client_id', False):
+        namespace = extra_data.get('client_id')
+
+    return sanitize_namespace(namespace)
+
+
+def sanitize_namespace(namespace):
+    """'::' would split the key of a namespace, it is replaced."""
+    return str(namespace or '').strip().replace(namespace_separator, '_')
+
+
+def prompt_namespace():
+    """Namespace of the running prompt on the prompt worker thread. '' on other threads (HTTP handlers) and between prompts."""
+    prompt_queue = getattr(PromptServer.instance, 'prompt_queue', None)
+    prompt_id = getattr(PromptServer.instance, 'last_prompt_id', None)
+    if prompt_queue is None or prompt_id is None:
+        return ''
+
+    if prompt_worker[0] is not None and prompt_worker[0] != threading.get_ident():
+        return ''
+
+    # last_prompt_id stays set after the prompt ends
+    running = [x for x in list(prompt_queue.currently_running.values()) if x[1] == prompt_id]
+    if not running:
+        return ''
+
+    if prompt_namespace_cache[0] != prompt_id:
+        prompt_namespace_cache[:] = prompt_id, resolve_namespace(running[0][2], running[0][3])
+
+    return prompt_namespace_cache[1]
+
+
+def current_namespace():
+    # threads of this pack set their namespace, anything else runs on behalf of the running prompt
+    namespace = getattr(namespace_context, 'namespace', None)
+    return prompt_namespace() if namespace is None else namespace
+
+
+def scoped_key(key):
+    """Cache key of `key` in the current namespace, where the nodes write."""
+    return namespace_key(current_namespace(), key)
+
+
+def resolve_key(key):
+    """Cache key that a lookup of `key` reads: the current namespace, or the read-only "shared_namespace" if only it has the key."""
+    own_key = scoped_key(key)
+    shared = cache._tag_option('*', 'shared_namespace')
+    if shared is None or own_key in cache or own_key in loading_futures:
+        return own_key
+
+    shared_key = namespace_key(shared, key)
+    return shared_key if shared_key in cache else own_key
+
+
+def update_cache(k, tag, v, load_time=None, persistent=None, logical_bytes=None):
+    """persistent: None follows the "persistent" setting of the tag, and keeps a persisted key persisted."""
+    k = scoped_key(k)
+    with cache_lock:
+        cnt = cache_count.get(k)
+        if cnt is None:
+            cnt = 0
+        else:
+            cnt += 1
         cache_count[k] = cnt
-    else:
-        cache_count[k] += 1
+        with file_stamps_lock:
+            file_stamps.pop(k, None)
+        target = cache
+
+    # written through to disk outside of cache_lock
+    persistent = target.persist(k, (tag, v), persistent, version=cnt)
+    with cache_lock:
+        cache.put(k, (tag, v), load_time=load_time, persistent=persistent, version=cnt, logical_bytes=logical_bytes, write_through=False)
 
 
 def cache_weak_hash(k):
+    k = resolve_key(k)
     cnt = cache_count.get(k)
     if cnt is None:
         cnt = 0
+    elif changed_model_file(k) is not None:
+        cnt += 1  # the count it gets when the Shared loader reloads it
 
     return k, cnt
 
 
+file_stamps = {}  # key -> [[path, size, mtime_ns, head hash], ...] of the model files the cached data was loaded from
+file_stamps_lock = threading.Lock()
+head_hash_bytes = 1 << 20
+
+
+def file_head_hash(path, size):
+    # first and last MB: the safetensors header and weight data on both ends
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        h.update(f.read(head_hash_bytes))
+        if size > 2 * head_hash_bytes:
+            f.seek(-head_hash_bytes, os.SEEK_END)
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def record_model_files(key, paths):
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append([path, st.st_size, st.st_mtime_ns, file_head_hash(path, st.st_size)])
+        except OSError as e:
+            logging.warning(f"[Inspire Pack] '{path}' of '{key}' can't be watched for changes. ({e})")
+
+    with file_stamps_lock:
+        file_stamps[key] = stamps
+
+
+def changed_model_file(key):
+    """
+    The model file of `key` that has changed on disk since it was cached, or None.
+    Only stats the files. The head hash is read only if the mtime changed but the size didn't (touched or copied over).
+    """
+    with file_stamps_lock:
+        stamps = [(stamp, *stamp) for stamp in file_stamps.get(key, [])]
+
+    # the files are stat'ed and hashed without the lock
+    for stamp, path, size, mtime, head_hash in stamps:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue  # removed: keep the cached data
+
+        if st.st_size == size and st.st_mtime_ns == mtime:
+            continue
+
+        try:
+            if st.st_size == size and file_head_hash(path, size) == head_hash:
+                with file_stamps_lock:
+                    stamp[2] = st.st_mtime_ns
+                continue
+        except OSError:
+            continue
+
+        return path
+
+    return None
+
+
+def model_files(folder_name, *model_names):
+    """Full paths of the model files a Shared loader reads. (`files` of `load_shared`)"""
+    paths = [folder_paths.get_full_path(folder_name, x) for x in model_names if x != "None"]
+    return [x for x in paths if x is not None]
+
+
+cache_priority_options = ["default", "low", "normal", "high", "pinned"]
+cache_priority_tooltip = "default: keep the setting of the key (settings file/API). pinned: never evicted. low/normal/high: priority class, lower classes are evicted first."
+
+
+def apply_priority_settings(key, settings):
+    """Apply "pinned" and "priority_class" of a preload spec or a pin request to `key` (including its namespace)."""
+    with cache_lock:
+        if 'priority_class' in settings:
+            cache.set_priority_class(key, settings['priority_class'])
+        if 'pinned' in settings:
+            cache.set_pinned(key, bool(settings['pinned']))
+        return cache.is_pinned(key)
+
+
+def apply_cache_priority(key, cache_priority):
+    # 'cache_priority' widget of the Cache/Shared loader nodes
+    key = scoped_key(key)
+    if cache_priority == 'pinned':
+        apply_priority_settings(key, {"pinned": True})
+    elif cache_priority != 'default':
+        apply_priority_settings(key, {"priority_class": cache_priority, "pinned": False})
+
+
+def record_load_latency(name, seconds):
+    with metrics_lock:
+        m = load_latency.setdefault(name, {"buckets": [0] * len(load_latency_buckets), "sum": 0.0, "count": 0})
+        for i, le in enumerate(load_latency_buckets):
+            if seconds <= le:
+                m["buckets"][i] += 1
+        m["sum"] += seconds
+        m["count"] += 1
+
+
+def load_shared(key, tag, loader, override=False, name=None, files=None, derived=False, record_access=True):
+    """
+    Return the cached data of `key`, or load it with `loader()` and cache it under `tag`.
+    Concurrent callers for the same key share a single load: the first one loads, the others wait for its result.
+    The load time is recorded under `name` (default: tag) for the metrics.
+    files: model files `loader` reads. If one of them changes on disk, the cached data is reloaded.
+           Their size is reported as the logical size of the data, unless it is `derived` from them (e.g. a LoRA-patched model).
+    record_access: record the access for the prefetch predictor. (False for preloads and prefetches)
+
+    :return: (cache tag, data, True if loaded by this call)
+    """
+    if record_access:
+        record_key_access(key, tag, loader, name, files, derived)
+
+    own_key = scoped_key(key)
+    stale = None  # cached data whose model file has changed on disk
+    while True:
+        with loading_lock:
+            future = loading_futures.get(own_key)
+            if future is not None:
+                is_owner = False
+                break
+
+            read_key = resolve_key(key)
+            v = None if override else cache.get(read_key)
+            if v is None or v[1][1] is stale:
+                future = Future()
+                loading_futures[own_key] = future
+                is_owner = True
+                break
+
+            if files is None:
+                return v[0], v[1][1], False
+
+        # the model files are checked outside loading_lock, it may stat and hash them
+        changed = changed_model_file(read_key)
+        if changed is None:
+            return v[0], v[1][1], False
+
+        logging.info(f"[Inspire Pack] '{changed}' has changed on disk. '{own_key}' is reloaded.")
+        stale = v[1][1]
+
+    if not is_owner:
+        loaded_tag, data = future.result()
+        return loaded_tag, data, False
+
+    outer_acquired = getattr(load_context, 'acquired', None)
+    load_context.acquired = acquired = []  # model files `loader` acquires from the weight daemon
+    try:
+        start = time.perf_counter()
+        try:
+            data = loader()
+        finally:
+            load_context.acquired = outer_acquired
+        elapsed = time.perf_counter() - start
+        record_load_latency(name or tag, elapsed)
+        update_cache(key, tag, (False, data), load_time=elapsed, logical_bytes=sum(os.path.getsize(x) for x in files) if files and not derived else None)
+        if acquired:
+            hold_shared_weights(own_key, data, acquired)
+        if files:
+            record_model_files(own_key, files)
+        future.set_result((tag, data))
+        return tag, data, True
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with loading_lock:
+            loading_futures.pop(own_key, None)
+
+
+key_predictor = KeySequencePredictor()
+prefetch_loaders = OrderedDict()  # key -> (namespace, key in the namespace, tag, loader, name, files) of its last load, to load it again when it is predicted. Least recently loaded first.
+prefetched_keys = set()  # keys loaded by a prefetch and not accessed since
+prefetch_stats = {"predictions": 0, "prefetches": 0, "hits": 0, "failures": 0}
+prefetch_lock = threading.Lock()
+prefetch_executor = None
+
+
+def get_prefetch_option(name, default):
+    return cache._tag_option('*', name, default)
+
+
+def record_key_access(key, tag, loader, name, files, derived):
+    """Record an access by the running prompt, and prefetch the keys that usually follow it."""
+    namespace = current_namespace()
+    own_key = namespace_key(namespace, key)
+    key_predictor.record(getattr(PromptServer.instance, 'last_prompt_id', None), own_key)
+
+    with prefetch_lock:
+        if not derived:
+            # derived data depends on an upstream object of the prompt (e.g. a LoRA-patched model)
+            prefetch_loaders.pop(own_key, None)
+            prefetch_loaders[own_key] = namespace, key, tag, loader, name, files
+            # bounded like the predictor: a loader holds its node's inputs alive
+            while len(prefetch_loaders) > key_predictor.max_keys:
+                prefetch_loaders.popitem(last=False)
+        if own_key in prefetched_keys:
+            prefetched_keys.discard(own_key)
+            if own_key in cache or own_key in loading_futures:
+                prefetch_stats['hits'] += 1
+
+    prefetch_after(own_key)
+
+
+def prefetch_after(key):
+    global prefetch_executor
+
+    predictions = key_predictor.predict(key, min_probability=get_prefetch_option('prefetch_min_probability', 0.5),
+                                        min_count=get_prefetch_option('prefetch_min_count', 2),
+                                        limit=get_prefetch_option('prefetch_max_keys', 2))
+    with prefetch_lock:
+        prefetch_stats['predictions'] += len(predictions)
+
+    if not get_prefetch_option('prefetch', False):
+        return
+
+    for next_key, probability in predictions:
+        with prefetch_lock:
+            job = prefetch_loaders.get(next_key)
+        if job is None or cache.is_resident(next_key) or next_key in loading_futures:
+            continue
+
+        namespace, raw_key, tag, loader, name, files = job
+        ram, _, _ = cache.get_memory_usage()
+        max_ram, _ = cache.get_memory_budget()
+        size = sum(os.path.getsize(x) for x in files if os.path.exists(x)) if files else 0
+        if max_ram is not None and ram + size > max_ram:
+            logging.info(f"[Inspire Pack] prefetch: '{next_key}' ({format_byte_size(size)}) is skipped. It doesn't fit in the memory budget.")
+            continue
+
+        with prefetch_lock:
+            if prefetch_executor is None:
+                prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inspire-prefetch")
+            prefetched_keys.add(next_key)
+            prefetch_stats['prefetches'] += 1
+
+        logging.info(f"[Inspire Pack] prefetch: '{next_key}' usually follows '{key}' (p={probability:.2f}). Loading it in the background.")
+        prefetch_executor.submit(run_prefetch, next_key, namespace, raw_key, tag, loader, name, files)
+
+
+def run_prefetch(key, namespace, raw_key, tag, loader, name, files):
+    namespace_context.namespace = namespace
+    try:
+        load_shared(raw_key, tag, loader, name=f"prefetch:{name or tag}", files=files, record_access=False)
+    except Exception as e:
+        with prefetch_lock:
+            prefetched_keys.discard(key)
+            prefetch_stats['failures'] += 1
+        logging.warning(f"[Inspire Pack] prefetch: failed to load '{key}': {e}")
+
+
+def get_prefetch_info():
+    """:return: {"stats", "sequences": recent per-prompt key sequences, "transitions": {key: {next key: count}}}"""
+    with prefetch_lock:
+        stats = dict(prefetch_stats)
+    return {"stats": stats, "sequences": key_predictor.get_sequences(), "transitions": key_predictor.get_transitions()}
+
+
+def tracked_module_ids():
+    """ids of the models that ComfyUI's model management tracks as loaded"""
+    tracked = set()
+    for x in comfy.model_management.current_loaded_models:
+        patcher = x.model
+        if patcher is not None:
+            tracked.add(id(patcher.model))
+    return tracked
+
+
+def offload_untracked_modules(data):
+    """
+    Move the GPU modules of `data` that ComfyUI's model management doesn't track (models of other packs, e.g. PuLID,
+    SAM) to the CPU. Tracked models are unloaded by ComfyUI itself.
+    :return: True if something was moved
+    """
+    tracked = tracked_module_ids()
+
+    moved = False
+    for module in iter_modules(data):
+        if id(module) in tracked:
+            continue
+        if any(t.device.type not in ['cpu', 'meta'] for t in itertools.chain(module.parameters(), module.buffers())):
+            module.to('cpu')
+            moved = True
+    return moved
+
+
+def untracked_memory_usage(memory):
+    """
+    :return: `releasable(data)` for `TaggedCache.release_memory`, the `memory` ('ram' | 'vram') bytes of `data` outside
+             the models ComfyUI tracks as loaded. Evicting those models frees nothing, ComfyUI still references them.
+    """
+    tracked = tracked_module_ids()
+
+    def releasable(data):
+        total = split_memory_usage(get_memory_usage(data))
+        held = [split_memory_usage(get_memory_usage(x)) for x in iter_modules(data) if id(x) in tracked]
+        i = 0 if memory == 'ram' else 1
+        return max(0, total[i] - sum(x[i] for x in held))
+
+    return releasable
+
+
+def release_cache_memory(nbytes, device):
+    """
+    Let ComfyUI reclaim `nbytes` of `device` from the backend cache: untracked GPU modules are offloaded to the CPU,
+    other entries are evicted (spilled if possible) by policy. Pinned entries and entries whose models are all loaded
+    by ComfyUI are kept.
+    :return: [(key, tag, 'offload' | 'evict', released bytes), ...]
+    """
+    memory = 'ram' if torch.device(device).type == 'cpu' else 'vram'
+    released = cache.release_memory(nbytes, memory=memory, offload=offload_untracked_modules,
+                                    releasable=untracked_memory_usage(memory))
+    if released:
+        gc.collect()
+        if memory == 'vram':
+            comfy.model_management.soft_empty_cache()
+        summary = ', '.join(f"'{key}' ({action} {format_byte_size(n)})" for key, _, action, n in released)
+        logging.info(f"[Inspire Pack] memory pressure on {device}: {format_byte_size(sum(x[3] for x in released))} released from the backend cache. {summary}")
+    return released
+
+
+def hook_free_memory():
+    """
+    Register the backend cache as a memory-pressure participant: when `comfy.model_management.free_memory` can't free
+    enough by unloading models, the cache releases the rest. Enabled by "*": {"memory_pressure": true}.
+    Requests beyond the size of the device (e.g. `unload_all_models`, or a model that is loaded in lowvram mode) are
+    not pressure, and "memory_pressure_max_bytes" caps what one request can release.
+    """
+    original = comfy.model_management.free_memory
+    if getattr(original, 'inspire_hooked', False):
+        return
+
+    def free_memory(memory_required, device, *args, **kwargs):
+        res = original(memory_required, device, *args, **kwargs)
+        global_settings = cache._tag_settings.get('*', {})
+        if global_settings.get('memory_pressure', False):
+            try:
+                if memory_required < comfy.model_management.get_total_memory(device):
+                    shortfall = memory_required - comfy.model_management.get_free_memory(device)
+                    max_bytes = parse_byte_size(global_settings.get('memory_pressure_max_bytes'))
+                    if max_bytes is not None:
+                        shortfall = min(shortfall, max_bytes)
+                    if shortfall > 0:
+                        release_cache_memory(shortfall, device)
+            except Exception as e:
+                logging.warning(f"[Inspire Pack] failed to release the backend cache under memory pressure: {e}")
+        return res
+
+    free_memory.inspire_hooked = True
+    comfy.model_management.free_memory = free_memory
+
+
+hook_free_memory()
+
+
+def unload_models_to_cpu(data):
+    """
+    Offload every GPU model of `data` to the CPU, including the models ComfyUI tracks.
+    Only safe on the prompt worker thread between prompts, see `run_idle_unloads`.
+    """
+    module_ids = {id(x) for x in iter_modules(data)}
+    moved = False
+    for i in reversed(range(len(comfy.model_management.current_loaded_models))):
+        loaded_model = comfy.model_management.current_loaded_models[i]
+        patcher = loaded_model.model
+        if patcher is not None and id(patcher.model) in module_ids:
+            loaded_model.model_unload()
+            comfy.model_management.current_loaded_models.pop(i)
+            moved = True
+
+    return offload_untracked_modules(data) or moved
+
+
+def get_idle_option(tag, name):
+    # per tag, with "*" as the default
+    v = cache._tag_option(tag, name)
+    return cache._tag_option('*', name) if v is None else v
+
+
+def get_queued_inputs():
+    """
+    :return: (string inputs of the running and pending prompts, {(namespace of the prompt, input), ...},
+              number of those prompts)
+    """
+    try:
+        running, pending = PromptServer.instance.prompt_queue.get_current_queue()
+    except Exception:
+        return set(), set(), 0
+
+    values = set()
+    namespaced = set()
+    for item in running + pending:
+        namespace = resolve_namespace(item[2], item[3])
+        for node in item[2].values():
+            for v in node.get('inputs', {}).values():
+                if isinstance(v, str) and v.strip() != '':
+                    values.add(v.strip())
+                    namespaced.add((namespace, v.strip()))
+    return values, namespaced, len(running) + len(pending)
+
+
+def is_queued_key(key, queued_inputs):
+    # the key itself (key_opt, Retrieve Backend Data, ...), or the model name of a default Shared loader key ('<model>_<dtype>', '<lora>_<strength>')
+    key = split_namespace_key(key)[1]
+    if not isinstance(key, str):
+        return str(key) in queued_inputs
+    return key in queued_inputs or any(key.startswith(f"{x}_") for x in queued_inputs if '.' in x)
+
+
+def is_idle_policy_enabled():
+    return any(isinstance(v, dict) and (v.get('idle_offload_seconds') is not None or v.get('idle_evict_seconds') is not None)
+               for v in cache._tag_settings.values())
+
+
+def run_idle_policy():
+    """
+    One pass of the idle policy:
+        GPU entries idle for "idle_offload_seconds" are moved to the CPU,
+        entries idle for "idle_evict_seconds" are evicted (spilled if possible),
+        entries referenced by a queued prompt are kept, and faulted back in from disk ahead of use.
+    Does nothing unless an idle threshold is set, the queue is not even looked at.
+    """
+    if not is_idle_policy_enabled():
+        return
+
+    queued_inputs, namespaced_inputs, queued_prompts = get_queued_inputs()
+    now = time.time()
+
+    for x in cache.get_inventory():
+        key, tag = x['key'], x['tag']
+        if x['pinned'] or is_queued_key(key, queued_inputs):
+            continue
+
+        idle = now - x['last_access']
+        evict_after = get_idle_option(tag, 'idle_evict_seconds')
+        offload_after = get_idle_option(tag, 'idle_offload_seconds')
+
+        if evict_after is not None and idle >= evict_after:
+            if cache.evict(key, reason='idle'):
+                logging.info(f"[Inspire Pack] idle policy: '{key}' ({tag}) is evicted after {idle:.0f}s idle.")
+        elif offload_after is not None and idle >= offload_after and x['vram'] > 0:
+            released = cache.offload(key, offload_untracked_modules)
+            if released:
+                logging.info(f"[Inspire Pack] idle policy: '{key}' ({tag}) is moved to the CPU after {idle:.0f}s idle. ({format_byte_size(released)} VRAM released)")
+            if not queued_prompts:
+                # models tracked by ComfyUI are unloaded by the prompt worker, while no prompt is running
+                request_idle_unload(key)
+
+    resident = {x['key'] for x in cache.get_inventory()}
+    shared = cache._tag_option('*', 'shared_namespace')
+    for namespace, value in namespaced_inputs:
+        # the key the prompt will read, the same way `resolve_key` picks it
+        key = namespace_key(namespace, value)
+        if key not in cache and shared is not None:
+            key = namespace_key(shared, value)
+
+        if key not in resident and key in cache:
+            if cache.get(key) is not None:
+                logging.info(f"[Inspire Pack] idle policy: '{key}' is promoted from disk for a queued prompt.")
+
+
+idle_unloads = set()  # keys whose models tracked by ComfyUI the prompt worker unloads once the queue is empty
+idle_unloads_lock = threading.Lock()
+
+
+def request_idle_unload(key):
+    prompt_queue = getattr(PromptServer.instance, 'prompt_queue', None)
+    if prompt_queue is None or not getattr(prompt_queue.get, 'inspire_hooked', False):
+        # no prompt has run yet, so ComfyUI has no models loaded
+        return
+
+    with idle_unloads_lock:
+        idle_unloads.add(key)
+
+    # wake the prompt worker if it is waiting for a prompt, its next `get` runs the unload
+    with prompt_queue.mutex:
+        prompt_queue.not_empty.notify()
+
+
+def run_idle_unloads(prompt_queue):
+    """Unload the models of the keys requested by the idle policy. Called on the prompt worker thread, holding `prompt_queue.mutex`."""
+    with idle_unloads_lock:
+        if not idle_unloads or prompt_queue.queue or prompt_queue.currently_running:
+            return
+        keys = list(idle_unloads)
+        idle_unloads.clear()
+
+    for key in keys:
+        released = cache.offload(key, unload_models_to_cpu)
+        if released:
+            logging.info(f"[Inspire Pack] idle policy: '{key}' is unloaded from ComfyUI to the CPU. ({format_byte_size(released)} VRAM released)")
+
+
+def idle_policy_loop():
+    namespace_context.namespace = ''
+    while True:
+        time.sleep(cache._tag_option('*', 'idle_check_interval', 10))
+        try:
+            run_idle_policy()
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] idle policy: {e}")
+
+
+threading.Thread(target=idle_policy_loop, name="inspire-idle-policy", daemon=True).start()
+
+
+def stable_cascade_keys(inputs):
+    res = []
+    if inputs['cache_mode'] in ['stage_b', 'all']:
+        res.append(inputs['key_opt_b'].strip() or inputs['stage_b'])
+    if inputs['cache_mode'] in ['stage_c', 'all']:
+        res.append(inputs['key_opt_c'].strip() or inputs['stage_c'])
+    return res
+
+
+# class_type -> cache keys of the node's inputs, the same as the node computes them
+shared_loader_keys = {
+    "CheckpointLoaderSimpleShared //Inspire": lambda x: [x['key_opt'].strip() or x['ckpt_name']],
+    "LoadDiffusionModelShared //Inspire": lambda x: [x['key_opt'].strip() or f"{x['model_name']}_{x['weight_dtype']}"],
+    "LoadTextEncoderShared //Inspire":
+        lambda x: [x['key_opt'].strip() or text_encoder_cache_key(x['model_name1'], x['model_name2'], x['model_name3'], x['type'], x.get('device', 'default'))],
+    "StableCascade_CheckpointLoader //Inspire": stable_cascade_keys,
+}
+
+
+def prompt_cache_keys(prompt):
+    """Cache keys of the Shared loaders of a prompt (API format). Nodes whose key depends on a link are skipped."""
+    keys = []
+    for node in prompt.values():
+        get_keys = shared_loader_keys.get(node.get('class_type'))
+        if get_keys is None:
+            continue
+
+        inputs = {k: v for k, v in node.get('inputs', {}).items() if not isinstance(v, list)}
+        try:
+            keys.extend(get_keys(inputs))
+        except KeyError:
+            continue
+    return keys
+
+
+queue_skips = {}  # prompt id -> number of later prompts that were run before it
+
+
+def promote_cached_prompt(queue):
+    """
+    Move the first pending prompt whose Shared loader models are all resident to the head of `queue` (a PromptQueue heap),
+    if the head prompt needs a model that isn't. A prompt is passed over at most "queue_reorder_max_skips" times.
+    The promoted item gets a number before the head's in the heap only. See `restore_promoted_prompt`.
+    :return: the promoted item as it was, or None
+    """
+    global queue_skips
+
+    window = cache._tag_option('*', 'queue_reorder_window', 16)
+    max_skips = cache._tag_option('*', 'queue_reorder_max_skips', 4)
+
+    queue_skips = {k: v for k, v in queue_skips.items() if any(x[1] == k for x in queue)}
+    items = sorted(queue, key=lambda x: x[0])[:window]
+    if len(items) < 2 or items[0][0] < 0:
+        # a single prompt, or one sent to the front of the queue
+        return None
+
+    shared = cache._tag_option('*', 'shared_namespace')
+
+    def is_ready(namespace, key):
+        own_key = namespace_key(namespace, key)
+        return (cache.is_resident(own_key) or own_key in loading_futures
+                or (shared is not None and cache.is_resident(namespace_key(shared, key))))
+
+    def missing_keys(item):
+        namespace = resolve_namespace(item[2], item[3])
+        keys = prompt_cache_keys(item[2])
+        return keys, [k for k in keys if not is_ready(namespace, k)]
+
+    _, head_missing = missing_keys(items[0])
+    if not head_missing:
+        return None
+
+    for i, item in enumerate(items[1:], 1):
+        if queue_skips.get(items[i-1][1], 0) >= max_skips:
+            return None
+
+        keys, missing = missing_keys(item)
+        if keys and not missing:
+            for x in items[:i]:
+                queue_skips[x[1]] = queue_skips.get(x[1], 0) + 1
+
+            queue[queue.index(item)] = (items[0][0] - 1, *item[1:])
+            heapq.heapify(queue)
+            logging.info(f"[Inspire Pack] queue reorder: prompt {item[1]} runs before {i} earlier prompt(s). "
+                         f"Its models {keys} are cached, {head_missing} of the next prompt are not.")
+            return item
+
+    return None
+
+
+def restore_promoted_prompt(prompt_queue, promoted, res):
+    """Put the original number of the `promoted` queue item back, in `get`'s result `(item, task id)` or in the queue."""
+    if res is not None and res[0][1] == promoted[1]:
+        prompt_queue.currently_running[res[1]] = copy.deepcopy(promoted)
+        return promoted, res[1]
+
+    for i, x in enumerate(prompt_queue.queue):
+        if x[1] == promoted[1]:
+            prompt_queue.queue[i] = promoted
+            heapq.heapify(prompt_queue.queue)
+            break
+    return res
+
+
+def hook_prompt_queue():
+    """
+    Let the prompt queue run prompts whose models are cached first. Enabled by "*": {"queue_reorder": true}.
+    The prompt worker also runs the idle policy's unloads of models tracked by ComfyUI here, between prompts.
+    Called from the on-prompt handler, since ComfyUI creates the queue after loading custom nodes.
+    """
+    prompt_queue = getattr(PromptServer.instance, 'prompt_queue', None)
+    if prompt_queue is None or getattr(prompt_queue.get, 'inspire_hooked', False):
+        return
+
+    original = prompt_queue.get
+
+    def get(*args, **kwargs):
+        prompt_worker[0] = threading.get_ident()
+        with prompt_queue.mutex:
+            try:
+                run_idle_unloads(prompt_queue)
+            except Exception as e:
+                logging.warning(f"[Inspire Pack] idle policy: {e}")
+
+            promoted = None
+            if cache._tag_option('*', 'queue_reorder', False):
+                try:
+                    promoted = promote_cached_prompt(prompt_queue.queue)
+                except Exception as e:
+                    logging.warning(f"[Inspire Pack] queue reorder: {e}")
+
+            res = None
+            try:
+                res = original(*args, **kwargs)
+            finally:
+                if promoted is not None:
+                    # only the heap sees the number of a promoted prompt changed. Clients keep its own number.
+                    res = restore_promoted_prompt(prompt_queue, promoted, res)
+            return res
+
+    get.inspire_hooked = True
+    prompt_queue.get = get
+
+
+weight_daemon_client = None
+weight_daemon_lock = threading.Lock()
+load_context = threading.local()  # "acquired": model files acquired from the weight daemon by the running loader
+shared_weight_refs = {}  # cache key -> (cached data, [model file, ...]), daemon references held while the data is cached
+shared_weight_refs_lock = threading.Lock()
+
+
+def model_dirs():
+    """Every ComfyUI model directory, the files the weight daemon may share"""
+    dirs = {folder_paths.models_dir}
+    for paths, _ in folder_paths.folder_names_and_paths.values():
+        dirs.update(paths)
+    return sorted(dirs)
+
+
+def get_weight_daemon():
+    """
+    Client of the weight daemon, or None if it is disabled or unreachable.
+
+    cache_settings.json: "*": {"weight_daemon": "unix:/tmp/inspire_weights.sock" | "tcp:127.0.0.1:8390",
+                               "weight_daemon_autostart": true, "weight_daemon_max_bytes": "64GB", "weight_daemon_shm_dir": ...}
+    """
+    global weight_daemon_client
+
+    global_settings = cache._tag_settings.get('*', {})
+    address = global_settings.get('weight_daemon')
+    if not address:
+        return None
+
+    with weight_daemon_lock:
+        if weight_daemon_client is not None and weight_daemon_client.address != address:
+            weight_daemon_client.close()
+            weight_daemon_client = None
+
+        if weight_daemon_client is None:
+            try:
+                weight_daemon_client = weight_daemon.WeightDaemonClient(address, autostart=global_settings.get('weight_daemon_autostart', True),
+                                                                        shm_dir=global_settings.get('weight_daemon_shm_dir', weight_daemon.default_shm_dir),
+                                                                        max_bytes=parse_byte_size(global_settings.get('weight_daemon_max_bytes')),
+                                                                        allowed_dirs=model_dirs())
+            except Exception as e:
+                logging.warning(f"[Inspire Pack] weight daemon: '{address}' is unreachable. Models are loaded without sharing. ({e})")
+                return None
+
+        return weight_daemon_client
+
+
+def map_shared_weights(folder_name, model_name):
+    """
+    Map a model file instead of reading it: the shared memory copy of the weight daemon if it is enabled, otherwise
+    the file itself if "*": {"mmap_weights": true} is set.
+    :return: (state dict, metadata) or (None, None) if the model is to be loaded normally
+    """
+    global weight_daemon_client
+
+    path = folder_paths.get_full_path_or_raise(folder_name, model_name)
+
+    client = get_weight_daemon()
+    if client is not None:
+        try:
+            shm_path = client.acquire(path)
+        except OSError as e:
+            logging.warning(f"[Inspire Pack] weight daemon: connection lost. ({e})")
+            with weight_daemon_lock:
+                if weight_daemon_client is client:
+                    weight_daemon_client = None
+            client.close()
+            shm_path = None
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] weight daemon: '{path}' is not shared. ({e})")
+            shm_path = None
+
+        if shm_path is not None:
+            try:
+                res = weight_daemon.map_safetensors(shm_path, source=path)
+            except Exception as e:
+                release_weight_files([path])
+                logging.warning(f"[Inspire Pack] weight daemon: '{path}' can't be mapped, it is loaded normally. ({e})")
+                return None, None
+
+            acquired = getattr(load_context, 'acquired', None)
+            if acquired is not None:
+                acquired.append(path)  # released when the cache entry is (see `hold_shared_weights`)
+            return res
+
+    if cache._tag_settings.get('*', {}).get('mmap_weights', False) and path.endswith('.safetensors'):
+        try:
+            return weight_daemon.map_safetensors(path)
+        except weight_daemon.UnsupportedDtypeError as e:
+            logging.warning(f"[Inspire Pack] '{path}' can't be mapped, it is loaded normally. ({e})")
+
+    return None, None
+
+
+def release_weight_files(paths):
+    client = weight_daemon_client
+    if client is None:
+        return  # the references were dropped with the connection
+    for path in paths:
+        try:
+            client.release(path)
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] weight daemon: failed to release '{path}': {e}")
+
+
+def hold_shared_weights(key, data, paths):
+    """Keep the daemon references of `paths` while `data` is cached under `key`."""
+    with shared_weight_refs_lock:
+        # the remove listener takes this lock after the entry has left the cache
+        value = cache.peek(key)
+        if value is None or value[1][1] is not data:
+            old = None, paths  # not admitted, or already replaced
+        else:
+            old = shared_weight_refs.get(key)
+            shared_weight_refs[key] = data, paths
+
+    if old is not None:
+        release_weight_files(old[1])
+
+
+def release_shared_weights(key, value):
+    # TaggedCache remove listener
+    with shared_weight_refs_lock:
+        item = shared_weight_refs.get(key)
+        if item is None or item[0] is not value[1][1]:
+            return
+        del shared_weight_refs[key]
+    release_weight_files(item[1])
+
+
+cache.add_remove_listener(release_shared_weights)
+
+
+def call_with_metadata(f, *args, metadata=None, **kwargs):
+    # `metadata` is only accepted by recent ComfyUI
+    if metadata is not None and 'metadata' in inspect.signature(f).parameters:
+        kwargs['metadata'] = metadata
+    return f(*args, **kwargs)
+
+
+def attach_to_shared_weights(name, sd, modules):
+    attached = weight_daemon.attach_shared_weights(modules, sd)
+    logging.info(f"[Inspire Pack] '{name}' is loaded from a memory-mapped file. ({format_byte_size(attached)} of CPU weights stay mapped)")
+
+
+def get_host_weight_dtypes(tag):
+    """
+    Storage dtypes of the models cached under `tag`: (diffusion model, text encoders), "default" keeps the file dtype.
+    ComfyUI casts compact weights to the compute dtype layer by layer on the way to the device.
+
+    cache_settings.json: "<tag>": {"weight_dtype": "fp8_e4m3fn" | "fp8_e4m3fn_fast" | "fp8_e5m2" | "bf16" | "fp16", "te_weight_dtype": ...}
+    """
+    res = []
+    for name in ['weight_dtype', 'te_weight_dtype']:
+        weight_dtype = cache._tag_option(tag, name, 'default') if tag is not None else 'default'
+        if weight_dtype not in ['default'] + host_weight_dtypes:
+            raise ValueError(f"[Inspire Pack] Invalid {name} '{weight_dtype}' of tag '{tag}'. ({', '.join(host_weight_dtypes)})")
+        res.append(weight_dtype)
+    return tuple(res)
+
+
+def load_checkpoint_file(ckpt_name, output_clipvision=False, tag=None):
+    """
+    CheckpointLoaderSimple (or unCLIPCheckpointLoader if output_clipvision) that maps the file if possible. (see `map_shared_weights`)
+    The weights are stored in the dtypes of `get_host_weight_dtypes(tag)`.
+    :return: (model, clip, vae) or (model, clip, vae, clip_vision)
+    """
+    weight_dtype, te_weight_dtype = get_host_weight_dtypes(tag)
+    options = {}
+    if weight_dtype != 'default' or te_weight_dtype != 'default':
+        options = {"model_options": weight_dtype_options(weight_dtype), "te_model_options": weight_dtype_options(te_weight_dtype)}
+
+    sd, metadata = map_shared_weights("checkpoints", ckpt_name)
+    if sd is not None:
+        out = call_with_metadata(comfy.sd.load_state_dict_guess_config, sd, output_vae=True, output_clip=True, output_clipvision=output_clipvision,
+                                 embedding_directory=folder_paths.get_folder_paths("embeddings"), metadata=metadata, **options)
+        if out is not None:
+            model, clip, vae, clip_vision = out[:4]
+            attach_to_shared_weights(ckpt_name, sd, [getattr(model, 'model', None),
+                                                     getattr(clip, 'cond_stage_model', None),
+                                                     getattr(vae, 'first_stage_model', None),
+                                                     getattr(clip_vision, 'model', None)])
+            return (model, clip, vae, clip_vision) if output_clipvision else (model, clip, vae)
+
+    if options:
+        out = comfy.sd.load_checkpoint_guess_config(folder_paths.get_full_path_or_raise("checkpoints", ckpt_name), output_vae=True, output_clip=True,
+                                                    output_clipvision=output_clipvision, embedding_directory=folder_paths.get_folder_paths("embeddings"), **options)
+        return out[:4] if output_clipvision else out[:3]
+
+    if output_clipvision:
+        return nodes.unCLIPCheckpointLoader().load_checkpoint(ckpt_name)
+    return nodes.CheckpointLoaderSimple().load_checkpoint(ckpt_name)[:3]
+
+
+def load_diffusion_model_file(model_name, weight_dtype, tag=None):
+    """
+    UNETLoader that maps the file if possible. (see `map_shared_weights`)
+    weight_dtype "default" falls back to the "weight_dtype" of `tag`. (see `get_host_weight_dtypes`)
+    """
+    if weight_dtype == 'default':
+        weight_dtype = get_host_weight_dtypes(tag)[0]
+
+    sd, metadata = map_shared_weights("diffusion_models", model_name)
+    if sd is not None:
+        model = call_with_metadata(comfy.sd.load_diffusion_model_state_dict, sd, model_options=weight_dtype_options(weight_dtype), metadata=metadata)
+        if model is not None:
+            attach_to_shared_weights(model_name, sd, [model.model])
+            return model
+
+    if weight_dtype in ['bf16', 'fp16']:
+        # not a choice of UNETLoader
+        return comfy.sd.load_diffusion_model(folder_paths.get_full_path_or_raise("diffusion_models", model_name), model_options=weight_dtype_options(weight_dtype))
+
+    return nodes.UNETLoader().load_unet(model_name, weight_dtype)[0]
+
+
+def load_lora_file(lora_name):
+    """
+    Raw LoRA state dict, shared by every LoRA-applying node of this pack.
+    Cached under the "lora_sd" tag and keyed by the path, size and mtime of the file, so changing the strength or the
+    base model doesn't read the file again, and an overwritten file is.
+    """
+    path = folder_paths.get_full_path_or_raise("loras", lora_name)
+    st = os.stat(path)
+    key = f"lora_sd:{path}:{st.st_size}:{st.st_mtime_ns}"
+    _, lora, _ = load_shared(key, "lora_sd", lambda: comfy.utils.load_torch_file(path, safe_load=True), name="lora_sd")
+    return lora
+
+
+def apply_lora(model, clip, lora_name, strength_model, strength_clip):
+    """LoraLoader.load_lora with the state dict of `load_lora_file`. clip can be None. :return: (model, clip)"""
+    if strength_model == 0 and strength_clip == 0:
+        return model, clip
+
+    lora = load_lora_file(lora_name)
+    return comfy.sd.load_lora_for_models(model, clip, lora, strength_model, strength_clip)
+
+
+bake_patches_tooltip = "Compute the LoRA-patched weights once and keep them in host RAM, so that moving the model to the GPU is a plain copy instead of re-patching. Costs host RAM for the patched weights."
+
+
+def bake_model_patches(model_patcher):
+    """
+    Clone of `model_patcher` whose weight patches are computed once and kept in host RAM as "set" patches.
+    Loading it to the device copies the baked weights instead of recomputing every patch.
+    The unpatched weights stay shared with `model_patcher`.
+    """
+    if model_patcher is None or not model_patcher.patches:
+        return model_patcher
+
+    device = comfy.model_management.get_torch_device()
+    baked = {}
+    for key, patches in model_patcher.patches.items():
+        backup = model_patcher.backup.get(key)
+        weight = getattr(backup, 'weight', backup) if backup is not None else comfy.utils.get_attr(model_patcher.model, key)
+
+        # same math as ModelPatcher.patch_weight_to_device
+        temp_weight = comfy.model_management.cast_to_device(weight, device, torch.float32, copy=True)
+        out_weight = comfy.lora.calculate_weight(patches, temp_weight, key)
+        if hasattr(comfy, 'float'):
+            out_weight = comfy.float.stochastic_rounding(out_weight, weight.dtype, seed=comfy.utils.string_to_seed(key))
+        else:
+            out_weight = out_weight.to(weight.dtype)
+        baked[key] = ("set", (out_weight.to('cpu'),))
+
+    n = model_patcher.clone()
+    n.patches = {}
+    n.add_patches(baked, 1.0)
+    logging.info(f"[Inspire Pack] {len(baked)} patched weights are baked. ({format_byte_size(sum(v[1][0].nbytes for v in baked.values()))})")
+    return n
+
+
 class CacheBackendData:
     @classmethod
     def INPUT_TYPES(s):
@@ -49,6 +1084,10 @@ class CacheBackendData:
                 "key": ("STRING", {"multiline": False, "placeholder": "Input data key (e.g. 'model a', 'chunli lora', 'girl latent 3', ...)"}),
                 "tag": ("STRING", {"multiline": False, "placeholder": "Tag: short description"}),
                 "data": (any_typ,),
+            },
+            "optional": {
+                "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
+                "persistent": ("BOOLEAN", {"default": False, "tooltip": "Also write the data to the persistent store, so that it survives restarts. If off, the \"persistent\" setting of the tag applies."}),
             }
         }
 
@@ -62,14 +1101,15 @@ class CacheBackendData:
     OUTPUT_NODE = True
 
     @staticmethod
-    def doit(key, tag, data):
+    def doit(key, tag, data, cache_priority='default', persistent=None):
         global cache
 
         if key == '*':
             logging.warning("[Inspire Pack] CacheBackendData: '*' is reserved key. Cannot use that key")
             return (None,)
 
-        update_cache(key, tag, (False, data))
+        apply_cache_priority(key, cache_priority)
+        update_cache(key, tag, (False, data), persistent=persistent or None)
         return (data,)
 
 
@@ -81,6 +1121,10 @@ class CacheBackendDataNumberKey:
                 "key": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "tag": ("STRING", {"multiline": False, "placeholder": "Tag: short description"}),
                 "data": (any_typ,),
+            },
+            "optional": {
+                "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
+                "persistent": ("BOOLEAN", {"default": False, "tooltip": "Also write the data to the persistent store, so that it survives restarts. If off, the \"persistent\" setting of the tag applies."}),
             }
         }
 
@@ -94,10 +1138,11 @@ class CacheBackendDataNumberKey:
     OUTPUT_NODE = True
 
     @staticmethod
-    def doit(key, tag, data):
+    def doit(key, tag, data, cache_priority='default', persistent=None):
         global cache
 
-        update_cache(key, tag, (False, data))
+        apply_cache_priority(key, cache_priority)
+        update_cache(key, tag, (False, data), persistent=persistent or None)
         return (data,)
 
 
@@ -109,6 +1154,10 @@ class CacheBackendDataList:
                 "key": ("STRING", {"multiline": False, "placeholder": "Input data key (e.g. 'model a', 'chunli lora', 'girl latent 3', ...)"}),
                 "tag": ("STRING", {"multiline": False, "placeholder": "Tag: short description"}),
                 "data": (any_typ,),
+            },
+            "optional": {
+                "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
+                "persistent": ("BOOLEAN", {"default": False, "tooltip": "Also write the data to the persistent store, so that it survives restarts. If off, the \"persistent\" setting of the tag applies."}),
             }
         }
 
@@ -125,14 +1174,15 @@ class CacheBackendDataList:
     OUTPUT_NODE = True
 
     @staticmethod
-    def doit(key, tag, data):
+    def doit(key, tag, data, cache_priority=('default',), persistent=(None,)):
         global cache
 
         if key == '*':
             logging.warning("[Inspire Pack] CacheBackendDataList: '*' is reserved key. Cannot use that key")
             return (None,)
 
-        update_cache(key[0], tag[0], (True, data))
+        apply_cache_priority(key[0], cache_priority[0])
+        update_cache(key[0], tag[0], (True, data), persistent=persistent[0] or None)
         return (data,)
 
 
@@ -144,6 +1194,10 @@ class CacheBackendDataNumberKeyList:
                 "key": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "tag": ("STRING", {"multiline": False, "placeholder": "Tag: short description"}),
                 "data": (any_typ,),
+            },
+            "optional": {
+                "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
+                "persistent": ("BOOLEAN", {"default": False, "tooltip": "Also write the data to the persistent store, so that it survives restarts. If off, the \"persistent\" setting of the tag applies."}),
             }
         }
 
@@ -159,9 +1213,10 @@ class CacheBackendDataNumberKeyList:
 
     OUTPUT_NODE = True
 
-    def doit(self, key, tag, data):
+    def doit(self, key, tag, data, cache_priority=('default',), persistent=(None,)):
         global cache
-        update_cache(key[0], tag[0], (True, data))
+        apply_cache_priority(key[0], cache_priority[0])
+        update_cache(key[0], tag[0], (True, data), persistent=persistent[0] or None)
         return (data,)
 
 
@@ -186,7 +1241,7 @@ class RetrieveBackendData:
     def doit(key):
         global cache
 
-        v = cache.get(key)
+        v = cache.get(resolve_key(key))
 
         if v is None:
             logging.warning(f"[RetrieveBackendData] '{key}' is unregistered key.")
@@ -239,12 +1294,25 @@ class RemoveBackendData:
     def doit(key, signal_opt=None):
         global cache
 
-        if key == '*':
-            cache = TaggedCache(cache_settings)
-        elif key in cache:
-            del cache[key]
-        else:
-            logging.warning(f"[Inspire Pack] RemoveBackendData: invalid data key {key}")
+        with cache_lock:
+            namespace = current_namespace()
+            if key == '*' and any(split_namespace_key(k)[0] != namespace for k in cache.keys()):
+                # other namespaces (and the shared one) are kept
+                for k in cache.keys():
+                    if split_namespace_key(k)[0] == namespace:
+                        try:
+                            del cache[k]
+                        except KeyError:
+                            pass
+            elif key == '*':
+                cache.clear()
+                new_cache = TaggedCache(cache_settings)
+                new_cache.inherit_state(cache)
+                cache = new_cache
+            elif scoped_key(key) in cache:
+                del cache[scoped_key(key)]
+            else:
+                logging.warning(f"[Inspire Pack] RemoveBackendData: invalid data key {key}")
 
         return (signal_opt,)
 
@@ -265,8 +1333,8 @@ class RemoveBackendDataNumberKey(RemoveBackendData):
     def doit(key, signal_opt=None):
         global cache
 
-        if key in cache:
-            del cache[key]
+        if scoped_key(key) in cache:
+            del cache[scoped_key(key)]
         else:
             logging.warning(f"[Inspire Pack] RemoveBackendDataNumberKey: invalid data key {key}")
 
@@ -305,15 +1373,43 @@ class ShowCachedInfo:
             else:
                 text2 += f'{k}: {tag}\n'
 
+        ram, vram, tag_usage = cache.get_memory_usage()
+        max_ram, max_vram = cache.get_memory_budget()
+        text_mem = "---- [Memory Usage] ----\n"
+        text_mem += f'RAM: {format_byte_size(ram)} / {format_byte_size(max_ram)}\n'
+        text_mem += f'VRAM: {format_byte_size(vram)} / {format_byte_size(max_vram)}\n'
+        mmap_bytes = sum(x['devices'].get('mmap', 0) for x in cache.get_inventory())
+        if mmap_bytes:
+            text_mem += f'Memory-mapped: {format_byte_size(mmap_bytes)} (page cache, not counted as RAM)\n'
+        pinned_ram, pinned_vram = cache.get_pinned_usage()
+        text_mem += f'Pinned: RAM {format_byte_size(pinned_ram)}, VRAM {format_byte_size(pinned_vram)}\n'
+        text_mem += f'Persistent: {len(cache.get_persisted_versions())} entries\n'
+        spill_usage = cache.get_spill_usage()
+        if spill_usage is not None:
+            spilled, spilled_count, max_spill = spill_usage
+            text_mem += f'Spill: {format_byte_size(spilled)} / {format_byte_size(max_spill)} ({spilled_count} entries)\n'
+        compact = [x for x in cache.get_inventory() if x['logical_bytes'] > x['resident_bytes']]
+        if compact:
+            text_mem += f"Compact storage: {format_byte_size(sum(x['resident_bytes'] for x in compact))} resident for {format_byte_size(sum(x['logical_bytes'] for x in compact))} of model files ({len(compact)} entries)\n"
+        dedup_usage = cache.get_dedup_usage()
+        if dedup_usage is not None:
+            text_mem += f'Deduplicated: {format_byte_size(dedup_usage)} (weights shared between entries)\n'
+        for k, v in tag_usage.items():
+            text_mem += f'{k}: {format_byte_size(v)}\n'
+        for k, (usage, count, quota) in sorted(cache.get_namespace_usage().items()):
+            if k != '':
+                text_mem += f"Namespace '{k}': {format_byte_size(usage)} / {format_byte_size(quota)} ({count} entries)\n"
+
         text3 = "---- [TagCache Settings] ----\n"
         for k, v in cache._tag_settings.items():
-            text3 += f'{k}: {v}\n'
+            text3 += f'{k}: {json.dumps(v)}\n'
 
         for k, v in cache._data.items():
-            if k not in cache._tag_settings:
+            # namespaced containers share the setting of their tag
+            if isinstance(k, str) and k not in cache._tag_settings:
                 text3 += f'{k}: {v.maxsize}\n'
 
-        return f'{text1}\n{text2}\n{text3}'
+        return f'{text1}\n{text2}\n{text_mem}\n{text3}'
 
     @staticmethod
     def set_cache_settings(data: str):
@@ -322,16 +1418,22 @@ class ShowCachedInfo:
 
         new_tag_settings = {}
         for s in settings:
-            k, v = s.split(":")
-            new_tag_settings[k] = int(v.strip())
+            if s.strip() == '':
+                continue
+            k, v = s.split(":", 1)
+            new_tag_settings[k.strip()] = json.loads(v.strip())  # count or {"maxsize": ..., "max_bytes": ...}
         if new_tag_settings == cache._tag_settings:
             # tag settings is not changed
             return
 
-        new_cache = TaggedCache(new_tag_settings)
-        for k, v in cache.items():
-            new_cache[k] = v
-        cache = new_cache
+        with cache_lock:
+            new_cache = TaggedCache(new_tag_settings)
+            new_cache.inherit_state(cache)
+            persisted = new_cache.get_persisted_versions()
+            for k, v in cache.items():
+                # already on disk, if persistent
+                new_cache.put(k, v, persistent=k in persisted, write_through=False)
+            cache = new_cache
 
     def doit(self, cache_info, key, unique_id):
         text = ShowCachedInfo.get_data()
@@ -353,6 +1455,7 @@ class CheckpointLoaderSimpleShared(nodes.CheckpointLoaderSimple):
                 },
                 "optional": {
                     "mode": (['Auto', 'Override Cache', 'Read Only'],),
+                    "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
                 }}
 
     RETURN_TYPES = ("MODEL", "CLIP", "VAE", "STRING")
@@ -361,7 +1464,7 @@ class CheckpointLoaderSimpleShared(nodes.CheckpointLoaderSimple):
 
     CATEGORY = "InspirePack/Backend"
 
-    def doit(self, ckpt_name, key_opt, mode='Auto'):
+    def doit(self, ckpt_name, key_opt, mode='Auto', cache_priority='default'):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[CheckpointLoaderSimpleShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -371,13 +1474,12 @@ class CheckpointLoaderSimpleShared(nodes.CheckpointLoaderSimple):
         else:
             key = key_opt.strip()
 
-        if key not in cache or mode == 'Override Cache':
-            res = self.load_checkpoint(ckpt_name)
-            update_cache(key, "ckpt", (False, res))
-            cache_kind = 'ckpt'
+        apply_cache_priority(key, cache_priority)
+        cache_kind, res, loaded = load_shared(key, "ckpt", lambda: load_checkpoint_file(ckpt_name, tag="ckpt"), override=mode == 'Override Cache', name="CheckpointLoaderSimpleShared",
+                                              files=model_files("checkpoints", ckpt_name))
+        if loaded:
             logging.info(f"[Inspire Pack] CheckpointLoaderSimpleShared: Ckpt '{ckpt_name}' is cached to '{key}'.")
         else:
-            cache_kind, (_, res) = cache[key]
             logging.info(f"[Inspire Pack] CheckpointLoaderSimpleShared: Cached ckpt '{key}' is loaded. (Loading skip)")
 
         if cache_kind == 'ckpt':
@@ -390,7 +1492,7 @@ class CheckpointLoaderSimpleShared(nodes.CheckpointLoaderSimple):
         return model, clip, vae, key
 
     @staticmethod
-    def IS_CHANGED(ckpt_name, key_opt, mode='Auto'):
+    def IS_CHANGED(ckpt_name, key_opt, mode='Auto', cache_priority='default'):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[CheckpointLoaderSimpleShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -415,7 +1517,8 @@ class LoadDiffusionModelShared(nodes.UNETLoader):
                               "weight_dtype": (["default", "fp8_e4m3fn", "fp8_e4m3fn_fast", "fp8_e5m2"],),
                               "key_opt": ("STRING", {"multiline": False, "placeholder": "If empty, use 'model_name' as the key."}),
                               "mode": (['Auto', 'Override Cache', 'Read Only'],),
-                              }
+                              },
+                "optional": { "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}), }
                 }
     RETURN_TYPES = ("MODEL", "STRING")
     RETURN_NAMES = ("model", "cache key")
@@ -424,7 +1527,7 @@ class LoadDiffusionModelShared(nodes.UNETLoader):
 
     CATEGORY = "InspirePack/Backend"
 
-    def doit(self, model_name, weight_dtype, key_opt, mode='Auto'):
+    def doit(self, model_name, weight_dtype, key_opt, mode='Auto', cache_priority='default'):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[LoadDiffusionModelShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -434,18 +1537,18 @@ class LoadDiffusionModelShared(nodes.UNETLoader):
         else:
             key = key_opt.strip()
 
-        if key not in cache or mode == 'Override Cache':
-            model = self.load_unet(model_name, weight_dtype)[0]
-            update_cache(key, "diffusion", (False, model))
+        apply_cache_priority(key, cache_priority)
+        _, model, loaded = load_shared(key, "diffusion", lambda: load_diffusion_model_file(model_name, weight_dtype, tag="diffusion"), override=mode == 'Override Cache', name="LoadDiffusionModelShared",
+                                       files=model_files("diffusion_models", model_name))
+        if loaded:
             logging.info(f"[Inspire Pack] LoadDiffusionModelShared: diffusion model '{model_name}' is cached to '{key}'.")
         else:
-            _, (_, model) = cache[key]
             logging.info(f"[Inspire Pack] LoadDiffusionModelShared: Cached diffusion model '{key}' is loaded. (Loading skip)")
 
         return model, key
 
     @staticmethod
-    def IS_CHANGED(model_name, weight_dtype, key_opt, mode='Auto'):
+    def IS_CHANGED(model_name, weight_dtype, key_opt, mode='Auto', cache_priority='default'):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[LoadDiffusionModelShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -471,7 +1574,9 @@ class LoadLoraShared(nodes.LoraLoaderModelOnly):
                               "strength_model": ("FLOAT", {"default": 1.0, "min": -100.0, "max": 100.0, "step": 0.01}),
                               "key_opt": ("STRING", {"multiline": False, "placeholder": "If empty, use 'model_name' as the key."}),
                               "mode": (['Auto', 'Override Cache', 'Read Only'],),
-                              }
+                              },
+                "optional": { "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}),
+                              "bake_patches": ("BOOLEAN", {"default": False, "tooltip": bake_patches_tooltip}), }
                 }
     RETURN_TYPES = ("MODEL", "STRING")
     RETURN_NAMES = ("model", "cache key")
@@ -480,7 +1585,7 @@ class LoadLoraShared(nodes.LoraLoaderModelOnly):
 
     CATEGORY = "InspirePack/Backend"
 
-    def doit(self, model, lora_name, strength_model, key_opt, mode='Auto'):
+    def doit(self, model, lora_name, strength_model, key_opt, mode='Auto', cache_priority='default', bake_patches=False):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[LoadLoraShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -490,26 +1595,27 @@ class LoadLoraShared(nodes.LoraLoaderModelOnly):
         else:
             key = key_opt.strip()
 
-        if key not in cache or mode == 'Override Cache':
+        def load():
             if strength_model == 0:
-                model_applied = model
-            else:
-                logging.info(f"[LoadLoraShared] Loading LoRA: {lora_name}")
-                # 获取 LoRA 文件的完整路径
-                #lora_path = folder_paths.get_full_path("loras", lora_name)
-                # 加载 LoRA 权重文件
-                logging.info(f"[Inspire Pack] Applying LoRA '{lora_name}' and caching to key '{key}'.")
-                model_applied = self.load_lora_model_only(model, lora_name, strength_model)[0]
-            update_cache(key, "diffusion", (False, model_applied))
+                return model
+
+            logging.info(f"[LoadLoraShared] Loading LoRA: {lora_name}")
+            logging.info(f"[Inspire Pack] Applying LoRA '{lora_name}' and caching to key '{key}'.")
+            model_lora = apply_lora(model, None, lora_name, strength_model, 0)[0]
+            return bake_model_patches(model_lora) if bake_patches else model_lora
+
+        apply_cache_priority(key, cache_priority)
+        _, model_applied, loaded = load_shared(key, "diffusion", load, override=mode == 'Override Cache', name="LoadLoraShared",
+                                               files=model_files("loras", lora_name), derived=True)
+        if loaded:
             logging.info(f"[Inspire Pack] LoadLoraShared: Lora '{lora_name}' is cached to '{key}'.")
         else:
-            _, (_, model_applied) = cache[key]
             logging.info(f"[Inspire Pack] LoadLoraShared: Cached Lora '{key}' is loaded. (Loading skip)")
 
         return model_applied, key
 
     @staticmethod
-    def IS_CHANGED(model_name, strength_model, key_opt, mode='Auto'):
+    def IS_CHANGED(model_name, strength_model, key_opt, mode='Auto', cache_priority='default', bake_patches=False):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[LoadLoraShared] key_opt cannot be omit if mode is 'Read Only'")
@@ -528,6 +1634,105 @@ class LoadLoraShared(nodes.LoraLoaderModelOnly):
 
 
 
+def parse_lora_stack(text):
+    """'<lora_name>:<strength>' per line, strength defaults to 1.0. Empty lines and '#' comments are skipped."""
+    stack = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+
+        name, strength = line, 1.0
+        if ':' in line and line not in folder_paths.get_filename_list("loras"):
+            head, tail = line.rsplit(':', 1)
+            try:
+                name, strength = head.strip(), float(tail)
+            except ValueError:
+                raise ValueError(f"[LoadLoraStackShared] invalid strength '{tail.strip()}' in '{line}'.")
+
+        if name not in folder_paths.get_filename_list("loras"):
+            raise ValueError(f"[LoadLoraStackShared] LoRA '{name}' does not exist.")
+        stack.append((name, strength))
+
+    return stack
+
+
+def lora_stack_tag(stack, i):
+    # intermediate prefixes are kept under their own tag, so a budget or quota of "lora_stack" bounds them
+    return "diffusion" if i == len(stack) - 1 else "lora_stack"
+
+
+def lora_stack_keys(key_opt, stack):
+    # one key per prefix of the stack. Without key_opt, a single LoRA gets the default key of LoadLoraShared.
+    prefix = f"{key_opt.strip()}|" if key_opt.strip() else ''
+    keys = []
+    for i in range(len(stack)):
+        keys.append(prefix + '+'.join(f"{name}_{strength}" for name, strength in stack[:i+1]))
+    return keys
+
+
+class LoadLoraStackShared:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": { "model": ("MODEL",),
+                              "lora_stack": ("STRING", {"multiline": True, "placeholder": "<lora_name>:<strength> per line, applied in order"}),
+                              "key_opt": ("STRING", {"multiline": False, "placeholder": "Key prefix (e.g. the base model). If empty, the keys are made of the LoRAs only.",
+                                                     "tooltip": "The keys don't include the input model. Set a different key_opt for each base model, "
+                                                                "otherwise a stack cached on one base model is reused on another."}),
+                              "mode": (['Auto', 'Override Cache'],),
+                              },
+                "optional": { "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}), }
+                }
+    RETURN_TYPES = ("MODEL", "STRING")
+    RETURN_NAMES = ("model", "cache key")
+
+    FUNCTION = "doit"
+
+    CATEGORY = "InspirePack/Backend"
+
+    DESCRIPTION = ("Applies a stack of LoRAs in order and caches the model of every prefix of the stack.\n"
+                   "If [A, B, C] is cached, [A, B, D] starts from the cached [A, B] and only applies D.\n"
+                   "The full stack is cached under the 'diffusion' tag, the shorter prefixes under 'lora_stack'.")
+
+    def doit(self, model, lora_stack, key_opt, mode='Auto', cache_priority='default'):
+        stack = parse_lora_stack(lora_stack)
+        if not stack:
+            return model, ""
+
+        keys = lora_stack_keys(key_opt, stack)
+        override = mode == 'Override Cache'
+        applied = []
+
+        def build(i):
+            # model with stack[:i+1] applied. Only the uncached levels recurse, so the longest cached prefix is reused.
+            if i < 0:
+                return model
+
+            lora_name, strength = stack[i]
+            apply_cache_priority(keys[i], cache_priority)
+            _, res, loaded = load_shared(keys[i], lora_stack_tag(stack, i), lambda: apply_lora(build(i - 1), None, lora_name, strength, 0)[0],
+                                         override=override, name="LoadLoraStackShared", files=model_files("loras", lora_name), derived=True)
+            if loaded:
+                applied.append(lora_name)
+            return res
+
+        res = build(len(stack) - 1)
+        logging.info(f"[Inspire Pack] LoadLoraStackShared: '{keys[-1]}' is ready. ({len(applied)} of {len(stack)} LoRAs applied, the rest from the cache)")
+        return res, keys[-1]
+
+    @staticmethod
+    def IS_CHANGED(model, lora_stack, key_opt, mode='Auto', cache_priority='default'):
+        try:
+            keys = lora_stack_keys(key_opt, parse_lora_stack(lora_stack))
+        except ValueError:
+            return lora_stack, key_opt
+
+        if mode == 'Override Cache':
+            return lora_stack, key_opt
+
+        return None, tuple(cache_weak_hash(k) for k in keys)
+
+
 class LoadTextEncoderShared:
     @classmethod
     def INPUT_TYPES(s):
@@ -538,7 +1743,8 @@ class LoadTextEncoderShared:
                               "key_opt": ("STRING", {"multiline": False, "placeholder": "If empty, use 'model_name' as the key."}),
                               "mode": (['Auto', 'Override Cache', 'Read Only'],),
                               },
-                "optional": { "device": (["default", "cpu"], {"advanced": True}), }
+                "optional": { "device": (["default", "cpu"], {"advanced": True}),
+                              "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}), }
                 }
     RETURN_TYPES = ("CLIP", "STRING")
     RETURN_NAMES = ("clip", "cache key")
@@ -562,80 +1768,73 @@ class LoadTextEncoderShared:
          "[Recipes triple]\n"
          "sd3: clip-l, clip-g, t5")
 
-    def doit(self, model_name1, model_name2, model_name3, type, key_opt, mode='Auto', device="default"):
-        if mode == 'Read Only':
-            if key_opt.strip() == '':
-                raise Exception("[LoadTextEncoderShared] key_opt cannot be omit if mode is 'Read Only'")
-            key = key_opt.strip()
-        elif key_opt.strip() == '':
-            key = model_name1
-            if model_name2 is not None:
-                key += f"_{model_name2}"
-            if model_name3 is not None:
-                key += f"_{model_name3}"
-            key += f"_{type}_{device}"
-        else:
-            key = key_opt.strip()
-
-        if key not in cache or mode == 'Override Cache':
-            if model_name2 != "None" and model_name3 != "None": # triple text encoder
-                if len({model_name1, model_name2, model_name3}) < 3:
-                    logging.error("[LoadTextEncoderShared] The same model has been selected multiple times.")
-                    raise ValueError("The same model has been selected multiple times.")
-
-                if type not in ["sd3"]:
-                    logging.error("[LoadTextEncoderShared] Currently, the triple text encoder is only supported in `sd3`.")
-                    raise ValueError("Currently, the triple text encoder is only supported in `sd3`.")
+    @staticmethod
+    def load_text_encoder(model_name1, model_name2, model_name3, type, device="default"):
+        if model_name2 != "None" and model_name3 != "None": # triple text encoder
+            if len({model_name1, model_name2, model_name3}) < 3:
+                logging.error("[LoadTextEncoderShared] The same model has been selected multiple times.")
+                raise ValueError("The same model has been selected multiple times.")
+
+            if type not in ["sd3"]:
+                logging.error("[LoadTextEncoderShared] Currently, the triple text encoder is only supported in `sd3`.")
+                raise ValueError("Currently, the triple text encoder is only supported in `sd3`.")
+
+            tcloader = nodes.NODE_CLASS_MAPPINGS["TripleCLIPLoader"]()
+            if hasattr(tcloader, 'execute'):
+                # node v3
+                return tcloader.execute(model_name1, model_name2, model_name3)[0]
+            else:
+                # legacy compatibility
+                return tcloader.load_clip(model_name1, model_name2, model_name3)[0]
 
-                tcloader = nodes.NODE_CLASS_MAPPINGS["TripleCLIPLoader"]()
-                if hasattr(tcloader, 'execute'):
-                    # node v3
-                    res = tcloader.execute(model_name1, model_name2, model_name3)[0]
-                else:
-                    # legacy compatibility
-                    res = tcloader.load_clip(model_name1, model_name2, model_name3)[0]
+        elif model_name2 != "None" or model_name3 != "None": # dual text encoder
+            second_model = model_name2 if model_name2 != "None" else model_name3
 
-            elif model_name2 != "None" or model_name3 != "None": # dual text encoder
-                second_model = model_name2 if model_name2 != "None" else model_name3
+            if model_name1 == second_model:
+                logging.error("[LoadTextEncoderShared] You have selected the same model for both.")
+                raise ValueError("[LoadTextEncoderShared] You have selected the same model for both.")
 
-                if model_name1 == second_model:
-                    logging.error("[LoadTextEncoderShared] You have selected the same model for both.")
-                    raise ValueError("[LoadTextEncoderShared] You have selected the same model for both.")
+            if type not in ["sdxl", "sd3", "flux", "hunyuan_video"]:
+                logging.error("[LoadTextEncoderShared] Currently, the triple text encoder is only supported in `sdxl, sd3, flux, hunyuan_video`.")
+                raise ValueError("Currently, the triple text encoder is only supported in `sdxl, sd3, flux, hunyuan_video`.")
 
-                if type not in ["sdxl", "sd3", "flux", "hunyuan_video"]:
-                    logging.error("[LoadTextEncoderShared] Currently, the triple text encoder is only supported in `sdxl, sd3, flux, hunyuan_video`.")
-                    raise ValueError("Currently, the triple text encoder is only supported in `sdxl, sd3, flux, hunyuan_video`.")
+            return nodes.NODE_CLASS_MAPPINGS["DualCLIPLoader"]().load_clip(model_name1, second_model, type=type, device=device)[0]
 
-                res = nodes.NODE_CLASS_MAPPINGS["DualCLIPLoader"]().load_clip(model_name1, second_model, type=type, device=device)[0]
+        else: # single text encoder
+            if type not in ["stable_diffusion", "stable_cascade", "sd3", "stable_audio", "mochi", "ltxv", "pixart", "cosmos"]:
+                logging.error("[LoadTextEncoderShared] Currently, the single text encoder is only supported in `stable_diffusion, stable_cascade, sd3, stable_audio, mochi, ltxv, pixart, cosmos`.")
+                raise ValueError("Currently, the single text encoder is only supported in `stable_diffusion, stable_cascade, sd3, stable_audio, mochi, ltxv, pixart, cosmos`.")
 
-            else: # single text encoder
-                if type not in ["stable_diffusion", "stable_cascade", "sd3", "stable_audio", "mochi", "ltxv", "pixart", "cosmos"]:
-                    logging.error("[LoadTextEncoderShared] Currently, the single text encoder is only supported in `stable_diffusion, stable_cascade, sd3, stable_audio, mochi, ltxv, pixart, cosmos`.")
-                    raise ValueError("Currently, the single text encoder is only supported in `stable_diffusion, stable_cascade, sd3, stable_audio, mochi, ltxv, pixart, cosmos`.")
+            return nodes.NODE_CLASS_MAPPINGS["CLIPLoader"]().load_clip(model_name1, type=type, device=device)[0]
 
-                res = nodes.NODE_CLASS_MAPPINGS["CLIPLoader"]().load_clip(model_name1, type=type, device=device)[0]
+    def doit(self, model_name1, model_name2, model_name3, type, key_opt, mode='Auto', device="default", cache_priority='default'):
+        if mode == 'Read Only':
+            if key_opt.strip() == '':
+                raise Exception("[LoadTextEncoderShared] key_opt cannot be omit if mode is 'Read Only'")
+            key = key_opt.strip()
+        elif key_opt.strip() == '':
+            key = text_encoder_cache_key(model_name1, model_name2, model_name3, type, device)
+        else:
+            key = key_opt.strip()
 
-            update_cache(key, "diffusion", (False, res))
+        apply_cache_priority(key, cache_priority)
+        _, res, loaded = load_shared(key, "diffusion", lambda: self.load_text_encoder(model_name1, model_name2, model_name3, type, device), override=mode == 'Override Cache', name="LoadTextEncoderShared",
+                                     files=model_files("text_encoders", model_name1, model_name2, model_name3))
+        if loaded:
             logging.info(f"[Inspire Pack] LoadTextEncoderShared: text encoder model set is cached to '{key}'.")
         else:
-            _, (_, res) = cache[key]
             logging.info(f"[Inspire Pack] LoadTextEncoderShared: Cached text encoder model set '{key}' is loaded. (Loading skip)")
 
         return res, key
 
     @staticmethod
-    def IS_CHANGED(model_name1, model_name2, model_name3, type, key_opt, mode='Auto', device="default"):
+    def IS_CHANGED(model_name1, model_name2, model_name3, type, key_opt, mode='Auto', device="default", cache_priority='default'):
         if mode == 'Read Only':
             if key_opt.strip() == '':
                 raise Exception("[LoadTextEncoderShared] key_opt cannot be omit if mode is 'Read Only'")
             key = key_opt.strip()
         elif key_opt.strip() == '':
-            key = model_name1
-            if model_name2 is not None:
-                key += f"_{model_name2}"
-            if model_name3 is not None:
-                key += f"_{model_name3}"
-            key += f"_{type}_{device}"
+            key = text_encoder_cache_key(model_name1, model_name2, model_name3, type, device)
         else:
             key = key_opt.strip()
 
@@ -679,7 +1878,9 @@ class StableCascade_CheckpointLoader:
                         "stage_c": (ckpts, {'default': default_stage_c}),
                         "key_opt_c": ("STRING", {"multiline": False, "placeholder": "If empty, use 'stage_c' as the key."}),
                         "cache_mode": (["none", "stage_b", "stage_c", "all"], {"default": "none"}),
-                     }}
+                     },
+                "optional": { "cache_priority": (cache_priority_options, {"tooltip": cache_priority_tooltip}), }
+                }
 
     RETURN_TYPES = ("MODEL", "VAE", "MODEL", "VAE", "CLIP_VISION", "CLIP", "STRING", "STRING")
     RETURN_NAMES = ("b_model", "b_vae", "c_model", "c_vae", "c_clip_vision", "clip", "key_b", "key_c")
@@ -687,7 +1888,7 @@ class StableCascade_CheckpointLoader:
 
     CATEGORY = "InspirePack/Backend"
 
-    def doit(self, stage_b, key_opt_b, stage_c, key_opt_c, cache_mode):
+    def doit(self, stage_b, key_opt_b, stage_c, key_opt_c, cache_mode, cache_priority='default'):
         if key_opt_b.strip() == '':
             key_b = stage_b
         else:
@@ -699,24 +1900,24 @@ class StableCascade_CheckpointLoader:
             key_c = key_opt_c.strip()
 
         if cache_mode in ['stage_b', "all"]:
-            if key_b not in cache:
-                res_b = nodes.CheckpointLoaderSimple().load_checkpoint(ckpt_name=stage_b)
-                update_cache(key_b, "ckpt", (False, res_b))
+            apply_cache_priority(key_b, cache_priority)
+            _, res_b, loaded = load_shared(key_b, "ckpt", lambda: load_checkpoint_file(stage_b, tag="ckpt"), name="StableCascade_CheckpointLoader",
+                                           files=model_files("checkpoints", stage_b))
+            if loaded:
                 logging.info(f"[Inspire Pack] StableCascade_CheckpointLoader: Ckpt '{stage_b}' is cached to '{key_b}'.")
             else:
-                _, (_, res_b) = cache[key_b]
                 logging.info(f"[Inspire Pack] StableCascade_CheckpointLoader: Cached ckpt '{key_b}' is loaded. (Loading skip)")
             b_model, clip, b_vae = res_b
         else:
             b_model, clip, b_vae = nodes.CheckpointLoaderSimple().load_checkpoint(ckpt_name=stage_b)
 
         if cache_mode in ['stage_c', "all"]:
-            if key_c not in cache:
-                res_c = nodes.unCLIPCheckpointLoader().load_checkpoint(ckpt_name=stage_c)
-                update_cache(key_c, "unclip_ckpt", (False, res_c))
+            apply_cache_priority(key_c, cache_priority)
+            _, res_c, loaded = load_shared(key_c, "unclip_ckpt", lambda: load_checkpoint_file(stage_c, output_clipvision=True, tag="unclip_ckpt"), name="StableCascade_CheckpointLoader",
+                                           files=model_files("checkpoints", stage_c))
+            if loaded:
                 logging.info(f"[Inspire Pack] StableCascade_CheckpointLoader: Ckpt '{stage_c}' is cached to '{key_c}'.")
             else:
-                _, (_, res_c) = cache[key_c]
                 logging.info(f"[Inspire Pack] StableCascade_CheckpointLoader: Cached ckpt '{key_c}' is loaded. (Loading skip)")
             c_model, _, c_vae, clip_vision = res_c
         else:
@@ -725,6 +1926,29 @@ class StableCascade_CheckpointLoader:
         return b_model, b_vae, c_model, c_vae, clip_vision, clip, key_b, key_c
 
 
+class CacheNamespace:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "namespace": ("STRING", {"multiline": False, "placeholder": "Backend cache namespace of this workflow"}),
+            }
+        }
+
+    RETURN_TYPES = ()
+    FUNCTION = "doit"
+
+    CATEGORY = "InspirePack/Backend"
+
+    OUTPUT_NODE = True
+
+    DESCRIPTION = ("Puts the backend cache keys of this workflow into a namespace, which has its own byte quota and eviction.\n"
+                   "The namespace is read from the prompt before it runs, so this node doesn't need to be connected.")
+
+    def doit(self, namespace):
+        return ()
+
+
 class IsCached:
     @classmethod
     def INPUT_TYPES(s):
@@ -744,10 +1968,10 @@ class IsCached:
 
     @staticmethod
     def IS_CHANGED(key, unique_id):
-        return common.is_changed(unique_id, key in cache)
+        return common.is_changed(unique_id, resolve_key(key) in cache)
 
     def doit(self, key, unique_id):
-        return (key in cache,)
+        return (resolve_key(key) in cache,)
 
 
 # WIP: not properly working, yet
@@ -793,6 +2017,396 @@ class CacheBridge:
             return (common.changed_cache[unique_id],)
 
 
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def get_metrics_text():
+    """Cache metrics in the Prometheus text exposition format."""
+    stats = cache.get_stats()
+    ram, vram, tag_usage = cache.get_memory_usage()
+    max_ram, max_vram = cache.get_memory_budget()
+    pinned_ram, pinned_vram = cache.get_pinned_usage()
+    spill_usage = cache.get_spill_usage()
+    dedup_usage = cache.get_dedup_usage()
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{prometheus_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    metric("inspire_cache_hits_total", "counter", "Backend cache lookups that found the key.",
+           [({"tag": tag}, n) for tag, n in stats['hits'].items()])
+    metric("inspire_cache_misses_total", "counter", "Backend cache lookups that did not find the key.",
+           [({}, stats['misses'])])
+    metric("inspire_cache_inserts_total", "counter", "Backend cache insertions.",
+           [({"tag": tag}, n) for tag, n in stats['inserts'].items()])
+    metric("inspire_cache_evictions_total", "counter", "Backend cache evictions.",
+           [({"tag": tag, "reason": reason}, n) for (tag, reason), n in stats['evictions'].items()])
+    metric("inspire_cache_entries", "gauge", "Number of cached entries.",
+           [({"tag": tag}, n) for tag, n in stats['entries'].items()])
+    metric("inspire_cache_resident_bytes", "gauge", "Measured tensor bytes of cached entries.",
+           [({"tag": tag}, n) for tag, n in tag_usage.items()])
+    metric("inspire_cache_memory_bytes", "gauge", "Measured tensor bytes of the backend cache.",
+           [({"memory": "ram"}, ram), ({"memory": "vram"}, vram)])
+    metric("inspire_cache_pinned_bytes", "gauge", "Measured tensor bytes of pinned entries. Included in inspire_cache_memory_bytes.",
+           [({"memory": "ram"}, pinned_ram), ({"memory": "vram"}, pinned_vram)])
+    metric("inspire_cache_spills_total", "counter", "Evicted entries written to the spill directory.",
+           [({"tag": tag}, n) for tag, n in stats['spills'].items()])
+    metric("inspire_cache_spill_hits_total", "counter", "Lookups served from the spill directory.",
+           [({"tag": tag}, n) for tag, n in stats['spill_hits'].items()])
+    if spill_usage is not None:
+        metric("inspire_cache_spill_bytes", "gauge", "Size of the spill directory.", [({}, spill_usage[0])])
+        metric("inspire_cache_spill_entries", "gauge", "Number of spilled entries.", [({}, spill_usage[1])])
+    if dedup_usage is not None:
+        metric("inspire_cache_dedup_bytes", "gauge", "Cached weight bytes shared between entries instead of copied.", [({}, dedup_usage)])
+    metric("inspire_cache_offloads_total", "counter", "Entries moved from VRAM to the CPU under ComfyUI memory pressure.",
+           [({"tag": tag}, n) for tag, n in stats['offloads'].items()])
+    with prefetch_lock:
+        prefetch = dict(prefetch_stats)
+    metric("inspire_cache_prefetch_predictions_total", "counter", "Next keys predicted from the key sequences of past prompts.",
+           [({}, prefetch['predictions'])])
+    metric("inspire_cache_prefetches_total", "counter", "Predicted keys loaded in the background.",
+           [({"result": "started"}, prefetch['prefetches']), ({"result": "failed"}, prefetch['failures'])])
+    metric("inspire_cache_prefetch_hits_total", "counter", "Prefetched keys that a prompt accessed while they were cached.",
+           [({}, prefetch['hits'])])
+    metric("inspire_cache_prefetch_hit_ratio", "gauge", "inspire_cache_prefetch_hits_total / prefetches started.",
+           [({}, prefetch['hits'] / prefetch['prefetches'] if prefetch['prefetches'] else 0)])
+    metric("inspire_cache_store_hits_total", "counter", "Lookups served from the persistent store.",
+           [({"tag": tag}, n) for tag, n in stats['store_hits'].items()])
+    namespace_usage = cache.get_namespace_usage()
+    metric("inspire_cache_namespace_bytes", "gauge", "Measured tensor bytes of cached entries per namespace. ('' is the default namespace)",
+           [({"namespace": ns}, v[0]) for ns, v in namespace_usage.items()])
+    metric("inspire_cache_namespace_entries", "gauge", "Number of cached entries per namespace.",
+           [({"namespace": ns}, v[1]) for ns, v in namespace_usage.items()])
+    metric("inspire_cache_namespace_quota_bytes", "gauge", "Byte quota of the namespace.",
+           [({"namespace": ns}, v[2]) for ns, v in namespace_usage.items() if v[2] is not None])
+    metric("inspire_cache_memory_budget_bytes", "gauge", "Memory budget of the backend cache.",
+           [({"memory": k}, v) for k, v in [("ram", max_ram), ("vram", max_vram)] if v is not None])
+
+    with metrics_lock:
+        latency = {k: {"buckets": list(v["buckets"]), "sum": v["sum"], "count": v["count"]} for k, v in load_latency.items()}
+
+    lines.append("# HELP inspire_cache_load_seconds Load time of cache misses per loader.")
+    lines.append("# TYPE inspire_cache_load_seconds histogram")
+    for name, m in latency.items():
+        label = prometheus_label(name)
+        for le, n in zip(load_latency_buckets, m["buckets"]):
+            lines.append(f'inspire_cache_load_seconds_bucket{{loader="{label}",le="{le}"}} {n}')
+        lines.append(f'inspire_cache_load_seconds_bucket{{loader="{label}",le="+Inf"}} {m["count"]}')
+        lines.append(f'inspire_cache_load_seconds_sum{{loader="{label}"}} {m["sum"]}')
+        lines.append(f'inspire_cache_load_seconds_count{{loader="{label}"}} {m["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+inventory_sort_keys = {
+    "key": lambda x: str(x["key"]),
+    "tag": lambda x: x["tag"],
+    "namespace": lambda x: x["namespace"],
+    "size": lambda x: x["size"],
+    "created": lambda x: x["created"],
+    "last_access": lambda x: x["last_access"],
+    "hits": lambda x: x["hits"],
+    "load_time": lambda x: x["load_time"] or 0,
+}
+
+
+def get_inventory(offset=0, limit=100, tag=None, sort="key", descending=False, refresh=False, namespace=None):
+    """
+    Paginated per-entry cache inventory.
+
+    :return: {"total": n, "offset": offset, "limit": limit, "entries": [{"key", "tag", "size", "ram", "vram", "devices", ...}, ...]}
+    """
+    if refresh:
+        cache.refresh_memory_usage()
+
+    entries = cache.get_inventory()
+    if tag is not None:
+        entries = [x for x in entries if x["tag"] == tag]
+    if namespace is not None:
+        entries = [x for x in entries if x["namespace"] == namespace]
+
+    if sort not in inventory_sort_keys:
+        raise ValueError(f"Invalid sort key '{sort}'. ({', '.join(inventory_sort_keys)})")
+    entries.sort(key=inventory_sort_keys[sort], reverse=descending)
+
+    return {"total": len(entries), "offset": offset, "limit": limit, "entries": entries[offset:offset+limit]}
+
+
+def text_encoder_cache_key(model_name1, model_name2, model_name3, type, device="default"):
+    key = model_name1
+    if model_name2 is not None:
+        key += f"_{model_name2}"
+    if model_name3 is not None:
+        key += f"_{model_name3}"
+    return key + f"_{type}_{device}"
+
+
+def run_node(class_type, inputs):
+    """Execute a loader node outside of a prompt and return its first output."""
+    if class_type not in nodes.NODE_CLASS_MAPPINGS:
+        raise Exception(f"[Inspire Pack] Node '{class_type}' is not installed.")
+
+    cls = nodes.NODE_CLASS_MAPPINGS[class_type]
+    res = getattr(cls(), cls.FUNCTION)(**inputs)
+
+    if isinstance(res, dict):
+        res = res['result']
+    elif not isinstance(res, (tuple, list)):
+        res = res.result  # node v3 output
+
+    return res[0]
+
+
+def resolve_preload_spec(spec):
+    """
+    Resolve a preload spec into (key, tag, loader). The default key and tag are the same as the Shared loaders use.
+
+    {"loader": "checkpoint", "model_name": ...}
+    {"loader": "diffusion_model", "model_name": ..., "weight_dtype": "default"}
+    {"loader": "text_encoder", "model_name1": ..., "model_name2": "None", "model_name3": "None", "type": ..., "device": "default"}
+    {"loader": "clip_vision", "model_name": ...}
+    {"loader": "vae", "model_name": ...}
+    {"loader": "insightface", "provider": "CPU", "model_name": "buffalo_l"}
+    {"loader": "node", "class_type": ..., "inputs": {...}}
+
+    Every spec accepts optional "key", "tag", "pinned", "priority_class" and "namespace".
+    """
+    kind = spec.get('loader', 'node')
+    key = spec.get('key', '').strip()
+
+    if 'priority_class' in spec:
+        parse_priority_class(spec['priority_class'])  # validate up front
+
+    if kind == 'checkpoint':
+        name = spec['model_name']
+        # CheckpointLoaderSimpleShared requires the 'ckpt' tag
+        return key or name, "ckpt", lambda: load_checkpoint_file(name, tag="ckpt")
+
+    elif kind == 'diffusion_model':
+        name = spec['model_name']
+        weight_dtype = spec.get('weight_dtype', 'default')
+        tag = spec.get('tag', "diffusion")
+        return key or f"{name}_{weight_dtype}", tag, lambda: load_diffusion_model_file(name, weight_dtype, tag=tag)
+
+    elif kind == 'text_encoder':
+        names = spec['model_name1'], spec.get('model_name2', "None"), spec.get('model_name3', "None")
+        clip_type = spec['type']
+        device = spec.get('device', 'default')
+        return (key or text_encoder_cache_key(*names, clip_type, device), spec.get('tag', "diffusion"),
+                lambda: LoadTextEncoderShared.load_text_encoder(*names, clip_type, device))
+
+    elif kind == 'clip_vision':
+        name = spec['model_name']
+        return key or name, spec.get('tag', "clipvision"), lambda: nodes.CLIPVisionLoader().load_clip(clip_name=name)[0]
+
+    elif kind == 'vae':
+        name = spec['model_name']
+        return key or name, spec.get('tag', "vae"), lambda: nodes.VAELoader().load_vae(name)[0]
+
+    elif kind == 'insightface':
+        provider = spec.get('provider', 'CPU')
+        model_name = spec.get('model_name', 'buffalo_l')
+        # same key as IPAdapterModelHelper
+        return (key or f"insightface-{provider}", spec.get('tag', "insightface"),
+                lambda: run_node('IPAdapterInsightFaceLoader', {"provider": provider, "model_name": model_name}))
+
+    elif kind == 'node':
+        if key == '':
+            raise ValueError("[Inspire Pack] 'key' is required for the 'node' preload spec.")
+        class_type = spec['class_type']
+        inputs = spec.get('inputs', {})
+        return key, spec.get('tag', ""), lambda: run_node(class_type, inputs)
+
+    raise ValueError(f"[Inspire Pack] Unknown preload loader '{kind}'")
+
+
+preload_executor = None
+preload_status = {}  # key -> {"loader", "status": queued|loading|loaded|cached|failed|skipped, "elapsed", "error"}
+preload_status_lock = threading.Lock()
+
+
+def set_preload_status(key, **kwargs):
+    with preload_status_lock:
+        preload_status[key] = {**preload_status.get(key, {}), **kwargs}
+        status = dict(preload_status[key])
+
+    PromptServer.instance.send_sync("inspire-cache-preload", {"key": key, **status})
+
+
+def get_preload_status():
+    with preload_status_lock:
+        return {k: dict(v) for k, v in preload_status.items()}
+
+
+def preload(specs, max_workers=2):
+    """
+    Load models straight into the backend cache in a background thread pool, without queuing a workflow.
+    Specs are validated up front. Progress is reported through `get_preload_status()` and 'inspire-cache-preload' events.
+
+    :return: list of the cache keys to be preloaded
+    """
+    global preload_executor
+
+    jobs = [(spec, *resolve_preload_spec(spec)) for spec in specs]
+
+    if preload_executor is None:
+        preload_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inspire-preload")
+
+    def run(spec, key, tag, loader):
+        namespace_context.namespace = sanitize_namespace(spec.get('namespace'))
+        raw_key, key = key, scoped_key(key)
+        apply_priority_settings(key, spec)
+        set_preload_status(key, status="loading")
+        start = time.perf_counter()
+        try:
+            _, _, loaded = load_shared(raw_key, tag, loader, override=spec.get('override', False), name=f"preload:{spec.get('loader', 'node')}",
+                                       files=preload_model_files(spec), record_access=False)
+            set_preload_status(key, status="loaded" if loaded else "cached", elapsed=time.perf_counter() - start)
+            logging.info(f"[Inspire Pack] preload: '{key}' is {'cached' if loaded else 'already cached'}.")
+        except Exception as e:
+            set_preload_status(key, status="failed", elapsed=time.perf_counter() - start, error=str(e))
+            logging.error(f"[Inspire Pack] preload: failed to load '{key}': {e}")
+
+    for spec, key, tag, loader in jobs:
+        set_preload_status(namespace_key(sanitize_namespace(spec.get('namespace')), key), loader=spec.get('loader', 'node'), status="queued", elapsed=None, error=None)
+        preload_executor.submit(run, spec, key, tag, loader)
+
+    return [namespace_key(sanitize_namespace(spec.get('namespace')), key) for spec, key, _, _ in jobs]
+
+
+preload_model_folders = {
+    'checkpoint': ["model_name"],
+    'diffusion_model': ["model_name"],
+    'text_encoder': ["model_name1", "model_name2", "model_name3"],
+    'clip_vision': ["model_name"],
+    'vae': ["model_name"],
+}
+
+preload_folder_names = {
+    'checkpoint': "checkpoints",
+    'diffusion_model': "diffusion_models",
+    'text_encoder': "text_encoders",
+    'clip_vision': "clip_vision",
+    'vae': "vae",
+}
+
+
+def preload_model_files(spec):
+    """Model files of a preload spec. None if unknown."""
+    kind = spec.get('loader', 'node')
+    if kind not in preload_folder_names:
+        return None
+
+    return model_files(preload_folder_names[kind], *[spec.get(field, "None") for field in preload_model_folders[kind]])
+
+
+def estimate_preload_size(spec):
+    """File size of the models of a preload spec. 0 if unknown."""
+    return sum(os.path.getsize(x) for x in preload_model_files(spec) or [])
+
+
+def load_manifest():
+    """
+    cache_manifest.json: {"models": [{<preload spec>, "priority": <higher first>}, ...], "wait_for_nodes": <seconds>}
+    """
+    if not os.path.exists(manifest_file):
+        return None
+
+    try:
+        with open(manifest_file, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logging.error(f"[Inspire Pack] Failed to load '{manifest_file}': {e}")
+        return None
+
+    if isinstance(manifest, list):
+        manifest = {"models": manifest}
+
+    return manifest
+
+
+def get_manifest_keys():
+    manifest = load_manifest()
+    if manifest is None:
+        return None
+
+    keys = []
+    for spec in manifest.get('models', []):
+        try:
+            keys.append(namespace_key(sanitize_namespace(spec.get('namespace')), resolve_preload_spec(spec)[0]))
+        except Exception as e:
+            logging.error(f"[Inspire Pack] Invalid spec in cache_manifest.json: {spec} ({e})")
+    return keys
+
+
+def warmup_from_manifest(manifest):
+    """Preload the manifest entries one by one, highest priority first, while they fit in the RAM budget."""
+    specs = sorted(manifest.get('models', []), key=lambda x: x.get('priority', 0), reverse=True)
+
+    # loader nodes of other extensions may be registered after this pack. One deadline for all of them.
+    deadline = time.monotonic() + manifest.get('wait_for_nodes', 60)
+    for spec in specs:
+        class_type = {'node': spec.get('class_type'), 'insightface': 'IPAdapterInsightFaceLoader'}.get(spec.get('loader', 'node'))
+        while class_type is not None and class_type not in nodes.NODE_CLASS_MAPPINGS and time.monotonic() < deadline:
+            time.sleep(1)
+
+    warmed = []
+    for spec in specs:
+        try:
+            key, tag, loader = resolve_preload_spec(spec)
+        except Exception as e:
+            logging.error(f"[Inspire Pack] Invalid spec in cache_manifest.json: {spec} ({e})")
+            continue
+
+        namespace_context.namespace = sanitize_namespace(spec.get('namespace'))
+        raw_key, key = key, scoped_key(key)
+        ram, _, _ = cache.get_memory_usage()
+        max_ram, _ = cache.get_memory_budget()
+        size = estimate_preload_size(spec)
+        if key not in cache and max_ram is not None and ram + size > max_ram:
+            logging.warning(f"[Inspire Pack] warm-up: '{key}' ({format_byte_size(size)}) is skipped. It doesn't fit in the memory budget.")
+            set_preload_status(key, loader=spec.get('loader', 'node'), status="skipped", elapsed=None, error="memory budget")
+            continue
+
+        apply_priority_settings(key, spec)
+        set_preload_status(key, loader=spec.get('loader', 'node'), status="loading", elapsed=None, error=None)
+        start = time.perf_counter()
+        try:
+            _, _, loaded = load_shared(raw_key, tag, loader, name=f"preload:{spec.get('loader', 'node')}", files=preload_model_files(spec),
+                                       record_access=False)
+            set_preload_status(key, status="loaded" if loaded else "cached", elapsed=time.perf_counter() - start)
+        except Exception as e:
+            set_preload_status(key, status="failed", elapsed=time.perf_counter() - start, error=str(e))
+            logging.error(f"[Inspire Pack] warm-up: failed to load '{key}': {e}")
+            continue
+
+        warmed.append(key)
+        evicted = [k for k in warmed if k not in cache]
+        if evicted:
+            logging.warning(f"[Inspire Pack] warm-up: stopped. The memory budget evicted {evicted}.")
+            break
+
+    logging.info(f"[Inspire Pack] warm-up: {len([k for k in warmed if k in cache])}/{len(specs)} entries of cache_manifest.json are cached.")
+
+
+def start_warmup():
+    manifest = load_manifest()
+    if manifest is None or not manifest.get('models'):
+        return
+
+    logging.info(f"[Inspire Pack] warm-up: preloading {len(manifest['models'])} entries of cache_manifest.json in the background.")
+    threading.Thread(target=warmup_from_manifest, args=(manifest,), name="inspire-warmup", daemon=True).start()
+
+
+start_warmup()
+
+
 NODE_CLASS_MAPPINGS = {
     "CacheBackendData //Inspire": CacheBackendData,
     "CacheBackendDataNumberKey //Inspire": CacheBackendDataNumberKey,
@@ -806,9 +2420,11 @@ NODE_CLASS_MAPPINGS = {
     "CheckpointLoaderSimpleShared //Inspire": CheckpointLoaderSimpleShared,
     "LoadDiffusionModelShared //Inspire": LoadDiffusionModelShared,
     "LoadLoraShared //Inspire": LoadLoraShared,
+    "LoadLoraStackShared //Inspire": LoadLoraStackShared,
     "LoadTextEncoderShared //Inspire": LoadTextEncoderShared,
     "StableCascade_CheckpointLoader //Inspire": StableCascade_CheckpointLoader,
     "IsCached //Inspire": IsCached,
+    "CacheNamespace //Inspire": CacheNamespace,
     # "CacheBridge //Inspire": CacheBridge,
 }
 
@@ -825,8 +2441,10 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "CheckpointLoaderSimpleShared //Inspire": "Shared Checkpoint Loader (Inspire)",
     "LoadDiffusionModelShared //Inspire": "Shared Diffusion Model Loader (Inspire)",
     "LoadLoraShared //Inspire": "Shared Lora Loader",
+    "LoadLoraStackShared //Inspire": "Shared LoRA Stack Loader (Inspire)",
     "LoadTextEncoderShared //Inspire": "Shared Text Encoder Loader (Inspire)",
     "StableCascade_CheckpointLoader //Inspire": "Stable Cascade Checkpoint Loader (Inspire)",
     "IsCached //Inspire": "Is Cached (Inspire)",
+    "CacheNamespace //Inspire": "Cache Namespace (Inspire)",
     # "CacheBridge //Inspire": "Cache Bridge (Inspire)"
 }
@@ -0,0 +1,77 @@
+"""
+Load time vs. capacity of the host weight dtypes of the backend cache. ("<tag>": {"weight_dtype": ...})
+
+For each dtype, the checkpoint is loaded the way the Shared Checkpoint Loader loads it, its host RAM is measured, and
+it is moved to the compute device and back, which is where compact weights are cast to the compute dtype.
+
+run from the ComfyUI directory:
+    python custom_nodes/ComfyUI-Inspire-Pack/inspire/benchmark_host_dtype.py models/checkpoints/sdxl.safetensors \
+        --dtypes default fp8_e4m3fn bf16 --ram-budget 64GB
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch
+import comfy.model_management
+import comfy.sd
+
+from libs.utils import format_byte_size, get_memory_usage, host_weight_dtypes, parse_byte_size, split_memory_usage, weight_dtype_options
+
+
+def run(path, weight_dtype, te_weight_dtype, repeat):
+    start = time.perf_counter()
+    model, clip, vae = comfy.sd.load_checkpoint_guess_config(path, output_vae=True, output_clip=True,
+                                                             model_options=weight_dtype_options(weight_dtype),
+                                                             te_model_options=weight_dtype_options(te_weight_dtype))[:3]
+    load_time = time.perf_counter() - start
+    ram, _ = split_memory_usage(get_memory_usage((model, clip, vae)))
+
+    to_device = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        comfy.model_management.load_models_gpu([model], force_full_load=True)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        to_device.append(time.perf_counter() - start)
+        comfy.model_management.unload_all_models()
+
+    del model, clip, vae
+    gc.collect()
+    comfy.model_management.soft_empty_cache()
+    return load_time, ram, sum(to_device) / max(len(to_device), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspire Pack host weight dtype benchmark")
+    parser.add_argument("checkpoint")
+    parser.add_argument("--dtypes", nargs="+", default=["default"] + host_weight_dtypes, choices=["default"] + host_weight_dtypes)
+    parser.add_argument("--te-dtype", default=None, choices=["default"] + host_weight_dtypes, help="text encoder dtype (default: same as --dtypes)")
+    parser.add_argument("--ram-budget", default="64GB", help="max_ram_bytes to compute the capacity for")
+    parser.add_argument("--repeat", type=int, default=3, help="device round trips per dtype")
+    args = parser.parse_args()
+
+    budget = parse_byte_size(args.ram_budget)
+    file_size = os.path.getsize(args.checkpoint)
+
+    print(f"{'weight_dtype':<18}{'load':>9}{'host RAM':>12}{'to device':>12}{'fits in ' + args.ram_budget:>16}")
+    for weight_dtype in args.dtypes:
+        try:
+            load_time, ram, to_device = run(args.checkpoint, weight_dtype, args.te_dtype or weight_dtype, args.repeat)
+        except Exception as e:
+            print(f"{weight_dtype:<18}failed: {e}")
+            continue
+
+        print(f"{weight_dtype:<18}{load_time:>8.2f}s{format_byte_size(ram):>12}{to_device:>11.2f}s{budget // max(ram, 1):>16}")
+
+    print(f"file: {format_byte_size(file_size)}")
+
+
+if __name__ == "__main__":
+    main()
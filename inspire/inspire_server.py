@@ -48,16 +48,65 @@ def cache_clear(request):
 def cache_refresh(request):
     return web.Response(text=backend_support.ShowCachedInfo.get_data(), status=200)
 
+@server.PromptServer.instance.routes.get("/inspire/cache/inventory")
+def cache_inventory(request):
+    query = request.rel_url.query
+    try:
+        res = backend_support.get_inventory(offset=int(query.get("offset", 0)), limit=int(query.get("limit", 100)),
+                                            tag=query.get("tag"), sort=query.get("sort", "key"),
+                                            descending=query.get("order", "asc") == "desc", refresh=query.get("refresh") == "1",
+                                            namespace=query.get("namespace"))
+    except ValueError as e:
+        return web.Response(text=f"{e}", status=400)
+
+    return web.json_response(res)
+
+
+@server.PromptServer.instance.routes.post("/inspire/cache/pin")
+async def cache_pin(request):
+    # body: {"key": ..., "pinned": true|false, "priority_class": "low"|"normal"|"high"|<int>|null}
+    try:
+        data = await request.json()
+        key = data['key']
+        pinned = backend_support.apply_priority_settings(key, data)
+        return web.json_response({"key": key, "pinned": pinned})
+    except Exception as e:
+        return web.Response(text=f"{e}", status=400)
+
+
+@server.PromptServer.instance.routes.get("/inspire/cache/weight_daemon")
+async def cache_weight_daemon(request):
+    client = backend_support.get_weight_daemon()
+    if client is None:
+        return web.Response(text="The weight daemon is disabled or unreachable.", status=404)
+
+    try:
+        # the connection is shared with loaders, which may be waiting for a copy
+        status = await asyncio.get_event_loop().run_in_executor(None, client.status)
+        return web.json_response(status)
+    except Exception as e:
+        return web.Response(text=f"{e}", status=500)
+
+
+@server.PromptServer.instance.routes.get("/inspire/cache/metrics")
+def cache_metrics(request):
+    return web.Response(text=backend_support.get_metrics_text(), content_type="text/plain", charset="utf-8")
+
+
+@server.PromptServer.instance.routes.get("/inspire/cache/prefetch")
+def cache_prefetch(request):
+    return web.json_response(backend_support.get_prefetch_info())
+
 #用于判断缓存是否存在
 @server.PromptServer.instance.routes.get("/inspire/cache/determine")
 async def cache_determine(request):
-    keys = ["pulid_eva_clip", "pulid_face_analysis", "pulid_model", "ben2_base", "sam3"]
-    keys_not_exist_list = []
-    isc = IsCached()
-    for key in keys:
-        c = isc.doit(key,None)[0]
-        if not c :
-            keys_not_exist_list.append(key)
+    keys = backend_support.get_manifest_keys()
+    if keys is None:
+        keys = ["pulid_eva_clip", "pulid_face_analysis", "pulid_model", "ben2_base", "sam3"]
+        keys_not_exist_list = [key for key in keys if not IsCached().doit(key, None)[0]]
+    else:
+        # manifest keys are already in the namespace of their spec
+        keys_not_exist_list = [key for key in keys if key not in backend_support.cache]
     cache_str = ','.join([str(item) for item in keys_not_exist_list])
     if len(keys_not_exist_list) != 0 :
         # 2. 获取当前的事件循环
@@ -107,6 +156,24 @@ async def cache_determine(request):
 #     else:
 #         return web.Response(text="缓存已加载。", status=200)
 
+@server.PromptServer.instance.routes.post("/inspire/cache/preload")
+async def cache_preload(request):
+    # body: [{"loader": "checkpoint", "model_name": ..., "key": ..., "tag": ...}, ...] or {"models": [...]}
+    try:
+        data = await request.json()
+        if isinstance(data, dict):
+            data = data.get('models', [])
+        keys = backend_support.preload(data)
+        return web.json_response({"keys": keys})
+    except Exception as e:
+        return web.Response(text=f"{e}", status=400)
+
+
+@server.PromptServer.instance.routes.get("/inspire/cache/preload")
+def cache_preload_status(request):
+    return web.json_response(backend_support.get_preload_status())
+
+
 @server.PromptServer.instance.routes.post("/inspire/cache/settings")
 async def set_cache_settings(request):
     data = await request.text()
@@ -463,6 +530,7 @@ def onprompt(json_data):
 
     force_reset_useless_params(json_data)
     clear_unused_node_changed_cache(json_data)
+    backend_support.hook_prompt_queue()
 
     return json_data
 
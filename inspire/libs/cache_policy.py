@@ -0,0 +1,411 @@
+"""
+Eviction policy containers for TaggedCache.
+
+Each container is a bounded dict for one tag. When it is full, `popitem()` evicts the entry chosen by the policy and
+reports it through `on_evict(key, value)`. `victim(skip)` tells which key would be evicted next, so that the byte budget
+of TaggedCache can evict through the same policy.
+
+`eviction_class(key)` returns None for a pinned key, which is never evicted, or its priority class. The policy only
+chooses among the keys of the lowest class. If every key is pinned, the container grows past `maxsize`.
+
+policies:
+    lru: least recently used, ordered by a SimpleLRUCache
+    lfu: least frequently used (ties: least recently used)
+    gds: GreedyDual-Size. Keeps the entries that are expensive to load per byte. cost: load time in seconds, size: bytes.
+
+admission:
+    tinylfu: A new key is admitted into a full cache only if it has been requested more often than the victim.
+             Keeps one-off keys from flushing hot entries.
+"""
+
+import heapq
+import itertools
+import logging
+from collections import OrderedDict
+
+
+class SimpleLRUCache:
+    """
+    In-tree bounded LRU dict. Same semantics as `cachetools.LRUCache` (reads refresh recency, `in` does not) and reports
+    evictions through `on_evict(key, value)`. `maxsize=None` never evicts. The 'lru' policy keeps its recency order in one.
+    """
+
+    def __init__(self, maxsize, on_evict=None):
+        self.maxsize = maxsize
+        self._on_evict = on_evict
+        self._data = OrderedDict()
+
+    @property
+    def currsize(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            return
+
+        if self.maxsize is not None:
+            if self.maxsize < 1:
+                raise ValueError('value too large')
+
+            while len(self._data) >= self.maxsize:
+                self.popitem()
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        """Keys, least recently used first."""
+        return iter(self._data)
+
+    def get(self, key, default=None):
+        if key in self._data:
+            return self[key]
+        return default
+
+    def peek(self, key):
+        """Read without refreshing recency."""
+        return self._data[key]
+
+    def pop(self, key, *default):
+        return self._data.pop(key, *default)
+
+    def popitem(self):
+        """Remove and return the least recently used item."""
+        try:
+            key, value = self._data.popitem(last=False)
+        except KeyError:
+            raise KeyError(f'{type(self).__name__} is empty') from None
+
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+        return key, value
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+
+class TinyLFU:
+    """Count-min sketch of recent request frequencies with periodic aging."""
+
+    def __init__(self, width=256, depth=4, max_count=15):
+        self.width = width
+        self.depth = depth
+        self.max_count = max_count
+        self.sample_size = width * 10
+        self._table = [[0] * width for _ in range(depth)]
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        for i in range(self.depth):
+            yield i, hash((h, i)) % self.width
+
+    def record(self, key):
+        for i, j in self._indexes(key):
+            if self._table[i][j] < self.max_count:
+                self._table[i][j] += 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            # aging: halve every counter so old popularity fades out
+            self._table = [[x // 2 for x in row] for row in self._table]
+            self._additions //= 2
+
+    def estimate(self, key):
+        return min(self._table[i][j] for i, j in self._indexes(key))
+
+    def admit(self, candidate, victim):
+        return self.estimate(candidate) > self.estimate(victim)
+
+
+class PolicyCache:
+    def __init__(self, maxsize, on_evict=None, admission=None, eviction_class=None):
+        self.maxsize = maxsize
+        self._on_evict = on_evict
+        self._eviction_class = eviction_class
+        self._admission = TinyLFU(width=max(64, maxsize * 16)) if admission == 'tinylfu' else None
+        self._data = {}
+
+    @property
+    def currsize(self):
+        return len(self._data)
+
+    # policy hooks
+    def _on_insert(self, key, cost, size):
+        raise NotImplementedError()
+
+    def _on_access(self, key):
+        raise NotImplementedError()
+
+    def _on_remove(self, key):
+        raise NotImplementedError()
+
+    def _on_evicted(self, key):
+        pass
+
+    def victim(self, skip=()):
+        """The key to be evicted next, or None."""
+        raise NotImplementedError()
+
+    def eviction_candidate(self, skip=()):
+        """The key to be evicted next, taking pins and priority classes into account, or None."""
+        if self._eviction_class is None:
+            return self.victim(skip)
+
+        classes = {}
+        for key in self._data:
+            if key not in skip:
+                eviction_class = self._eviction_class(key)
+                if eviction_class is not None:
+                    classes[key] = eviction_class
+
+        if not classes:
+            return None
+
+        lowest = min(classes.values())
+        return self.victim(skip={k for k in self._data if classes.get(k) != lowest})
+
+    def put(self, key, value, cost=None, size=None):
+        """
+        Insert or replace `key`. `cost` (load seconds) and `size` (bytes) are used by cost-aware policies.
+        :return: False if the admission filter rejected the key
+        """
+        if self._admission is not None:
+            self._admission.record(key)
+
+        if key in self._data:
+            self._on_remove(key)
+            self._data[key] = value
+            self._on_insert(key, cost, size)
+            return True
+
+        if self.maxsize < 1:
+            raise ValueError('value too large')
+
+        if len(self._data) >= self.maxsize and self._admission is not None:
+            victim = self.eviction_candidate()
+            if victim is not None and not self._admission.admit(key, victim):
+                return False
+
+        while len(self._data) >= self.maxsize:
+            if self.eviction_candidate() is None:
+                logging.warning(f"[Inspire Pack] TaggedCache: every entry is pinned. The tag grows past maxsize ({self.maxsize}).")
+                break
+            self.popitem()
+
+        self._data[key] = value
+        self._on_insert(key, cost, size)
+        return True
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        self._on_access(key)
+        if self._admission is not None:
+            self._admission.record(key)
+        return value
+
+    def peek(self, key):
+        """Read without updating the policy."""
+        return self._data[key]
+
+    def get(self, key, default=None):
+        if key in self._data:
+            return self[key]
+        return default
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._on_remove(key)
+
+    def pop(self, key, *default):
+        if key not in self._data:
+            if default:
+                return default[0]
+            raise KeyError(key)
+
+        value = self._data.pop(key)
+        self._on_remove(key)
+        return value
+
+    def evict(self, key):
+        """Remove `key` as an eviction chosen outside (e.g. by a byte budget). `on_evict` is not called."""
+        self._on_evicted(key)
+        return self.pop(key)
+
+    def popitem(self):
+        """Evict the entry chosen by the policy."""
+        key = self.eviction_candidate()
+        if key is None:
+            raise KeyError(f'{type(self).__name__} has nothing to evict')
+
+        value = self.evict(key)
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+        return key, value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def values(self):
+        return self._data.values()
+
+    def items(self):
+        return self._data.items()
+
+
+class LRUCache(PolicyCache):
+    def __init__(self, maxsize, on_evict=None, admission=None, eviction_class=None):
+        super().__init__(maxsize, on_evict, admission, eviction_class)
+        # unbounded: PolicyCache enforces maxsize, and pinned keys may grow the tag past it
+        self._order = SimpleLRUCache(None)
+
+    def _on_insert(self, key, cost, size):
+        self._order[key] = None
+
+    def _on_access(self, key):
+        self._order[key]  # a read refreshes recency
+
+    def _on_remove(self, key):
+        del self._order[key]
+
+    def victim(self, skip=()):
+        for key in self._order:
+            if key not in skip:
+                return key
+        return None
+
+
+class LFUCache(PolicyCache):
+    def __init__(self, maxsize, on_evict=None, admission=None, eviction_class=None):
+        super().__init__(maxsize, on_evict, admission, eviction_class)
+        self._freq = {}
+        self._buckets = {}  # freq -> OrderedDict of keys in LRU order
+
+    def _add_to_bucket(self, key, freq):
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def _remove_from_bucket(self, key):
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+        return freq
+
+    def _on_insert(self, key, cost, size):
+        self._add_to_bucket(key, 1)
+
+    def _on_access(self, key):
+        self._add_to_bucket(key, self._remove_from_bucket(key) + 1)
+
+    def _on_remove(self, key):
+        self._remove_from_bucket(key)
+
+    def victim(self, skip=()):
+        for freq in sorted(self._buckets):
+            for key in self._buckets[freq]:
+                if key not in skip:
+                    return key
+        return None
+
+
+class GDSCache(PolicyCache):
+    def __init__(self, maxsize, on_evict=None, admission=None, eviction_class=None):
+        super().__init__(maxsize, on_evict, admission, eviction_class)
+        self._inflation = 0.0  # L
+        self._priority = {}  # key -> (H, seq) of its live heap item
+        self._cost = {}  # key -> cost / size
+        self._heap = []  # (H, seq, key), stale items are skipped lazily
+        self._seq = itertools.count()
+
+    def _set_priority(self, key):
+        item = (self._inflation + self._cost[key], next(self._seq), key)
+        self._priority[key] = item[:2]
+        heapq.heappush(self._heap, item)
+
+        if len(self._heap) > 4 * len(self._priority) + 64:
+            self._heap = [x for x in self._heap if self._is_valid(x)]
+            heapq.heapify(self._heap)
+
+    def _on_insert(self, key, cost, size):
+        self._cost[key] = (cost or 0.0) / max(size or 1, 1) * (1 << 30)  # seconds per GB
+        self._set_priority(key)
+
+    def _on_access(self, key):
+        self._set_priority(key)
+
+    def _on_remove(self, key):
+        del self._priority[key]
+        del self._cost[key]
+
+    def _is_valid(self, item):
+        return self._priority.get(item[2]) == item[:2]
+
+    def victim(self, skip=()):
+        while self._heap and not self._is_valid(self._heap[0]):
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return None
+
+        if self._heap[0][2] not in skip:
+            return self._heap[0][2]
+
+        for item in sorted(self._heap):
+            if self._is_valid(item) and item[2] not in skip:
+                return item[2]
+        return None
+
+    def _on_evicted(self, key):
+        # L rises to the H of the evicted entry, so that entries which are not accessed age out
+        self._inflation = max(self._inflation, self._priority[key][0])
+
+
+policies = {
+    'lru': LRUCache,
+    'lfu': LFUCache,
+    'gds': GDSCache,
+}
+
+
+def create_policy_cache(policy, maxsize, on_evict=None, admission=None, eviction_class=None):
+    if policy not in policies:
+        raise ValueError(f"Unknown cache policy '{policy}'. ({', '.join(policies)})")
+
+    if admission not in (None, 'tinylfu'):
+        raise ValueError(f"Unknown cache admission '{admission}'. (tinylfu)")
+
+    return policies[policy](maxsize, on_evict=on_evict, admission=admission, eviction_class=eviction_class)
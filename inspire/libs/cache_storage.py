@@ -0,0 +1,425 @@
+"""
+Disk storage for TaggedCache entries.
+
+Entries are stored as safetensors files. A serializer turns the cached data into a tensor table and a JSON payload,
+which is kept in the safetensors metadata. Serializers are tried in registration order, and other packs can register
+their own with `register_serializer`.
+
+built-in serializers:
+    tensor: a single tensor (IMAGE, MASK, ...)
+    latent: LATENT dicts
+    conditioning: CONDITIONING lists
+    tree: any nesting of tensors, dicts, lists, tuples and plain python values
+
+Models and other objects can't be stored.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+
+class NotStorable(Exception):
+    pass
+
+
+plain_types = (type(None), bool, int, float, str)
+
+
+def flatten_tensors(data):
+    """
+    :return: (tensors: {name: tensor}, skeleton: json-serializable structure)
+    :raises NotStorable: if `data` contains something other than tensors, dicts, lists, tuples and plain values
+    """
+    tensors = {}
+    names = {}  # id(tensor) -> name, the same tensor object is stored once
+    storages = set()
+
+    def walk(x):
+        if isinstance(x, torch.Tensor):
+            name = names.get(id(x))
+            if name is None:
+                name = str(len(tensors))
+                t = x.detach().to('cpu').contiguous()
+                storage = t.untyped_storage().data_ptr()
+                if storage in storages:
+                    t = t.clone()  # safetensors refuses tensors that share memory
+                storages.add(t.untyped_storage().data_ptr())
+                tensors[name] = t
+                names[id(x)] = name
+            return {"t": name}
+        elif isinstance(x, plain_types):
+            return {"v": x}
+        elif isinstance(x, dict):
+            if not all(isinstance(k, plain_types) for k in x):
+                raise NotStorable(f"dict keys of {[type(k).__name__ for k in x]}")
+            return {"d": [[k, walk(v)] for k, v in x.items()]}
+        elif isinstance(x, list):
+            return {"l": [walk(v) for v in x]}
+        elif isinstance(x, tuple):
+            return {"tu": [walk(v) for v in x]}
+
+        raise NotStorable(type(x).__name__)
+
+    return tensors, walk(data)
+
+
+def unflatten_tensors(skeleton, tensors):
+    def build(x):
+        if "t" in x:
+            return tensors[x["t"]]
+        elif "v" in x:
+            return x["v"]
+        elif "d" in x:
+            return {k: build(v) for k, v in x["d"]}
+        elif "l" in x:
+            return [build(v) for v in x["l"]]
+        elif "tu" in x:
+            return tuple(build(v) for v in x["tu"])
+
+        raise ValueError(f"Invalid skeleton: {x}")
+
+    return build(skeleton)
+
+
+class Serializer:
+    name = None
+
+    def accepts(self, data):
+        raise NotImplementedError()
+
+    def encode(self, data):
+        """:return: (tensors: {name: tensor}, payload: json-serializable)"""
+        raise NotImplementedError()
+
+    def decode(self, tensors, payload):
+        raise NotImplementedError()
+
+
+class TreeSerializer(Serializer):
+    name = 'tree'
+
+    def accepts(self, data):
+        return True  # `encode` raises NotStorable for the rest
+
+    def encode(self, data):
+        return flatten_tensors(data)
+
+    def decode(self, tensors, payload):
+        return unflatten_tensors(payload, tensors)
+
+
+class TensorSerializer(TreeSerializer):
+    name = 'tensor'
+
+    def accepts(self, data):
+        return isinstance(data, torch.Tensor)
+
+
+class LatentSerializer(TreeSerializer):
+    name = 'latent'
+
+    def accepts(self, data):
+        return isinstance(data, dict) and isinstance(data.get('samples'), torch.Tensor)
+
+
+class ConditioningSerializer(TreeSerializer):
+    name = 'conditioning'
+
+    def accepts(self, data):
+        return (isinstance(data, list) and len(data) > 0 and
+                all(isinstance(x, (list, tuple)) and len(x) == 2 and isinstance(x[0], torch.Tensor) and isinstance(x[1], dict) for x in data))
+
+
+serializers = [TensorSerializer(), LatentSerializer(), ConditioningSerializer(), TreeSerializer()]
+
+
+def register_serializer(serializer):
+    """Register a `Serializer`. It is tried before the built-in ones."""
+    serializers.insert(0, serializer)
+
+
+def encode_data(data):
+    for serializer in serializers:
+        if serializer.accepts(data):
+            try:
+                tensors, payload = serializer.encode(data)
+                return serializer.name, tensors, payload
+            except NotStorable:
+                continue
+
+    raise NotStorable(type(data).__name__)
+
+
+def decode_data(name, tensors, payload):
+    for serializer in serializers:
+        if serializer.name == name:
+            return serializer.decode(tensors, payload)
+
+    raise ValueError(f"Unknown serializer '{name}'")
+
+
+def write_entry(path, value, metadata=None):
+    """
+    Write a cache value (tag, (is_list, data)) to `path`.
+    :return: file size
+    """
+    tag, (is_list, data) = value
+    name, tensors, payload = encode_data(data)
+
+    header = {**(metadata or {}), "inspire_tag": tag, "inspire_is_list": json.dumps(is_list),
+              "inspire_serializer": name, "inspire_payload": json.dumps(payload)}
+
+    tmp_path = path + ".tmp"
+    save_file(tensors, tmp_path, metadata=header)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def read_entry(path):
+    """
+    Read a cache value written by `write_entry`. The file is read through a memory map.
+    :return: (value, metadata)
+    """
+    with safe_open(path, framework="pt") as f:
+        metadata = f.metadata()
+        tensors = {k: f.get_tensor(k) for k in f.keys()}
+
+    data = decode_data(metadata["inspire_serializer"], tensors, json.loads(metadata["inspire_payload"]))
+    value = metadata["inspire_tag"], (json.loads(metadata["inspire_is_list"]), data)
+    return value, metadata
+
+
+spill_suffix = ".spill.safetensors"
+cleaned_spill_dirs = set()
+
+
+class SpillStore:
+    """
+    Disk tier of TaggedCache. Evicted entries are written to `path` and faulted back in on lookup.
+    The directory is capped by `max_bytes` with its own LRU. Spill files don't outlive the process.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> (filename, size, load_time), in LRU order
+        self._usage = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _prepare_dir(self):
+        os.makedirs(self.path, exist_ok=True)
+        if self.path not in cleaned_spill_dirs:
+            # leftovers of a previous run
+            for x in os.listdir(self.path):
+                if x.endswith(spill_suffix) or x.endswith(spill_suffix + ".tmp"):
+                    os.remove(os.path.join(self.path, x))
+            cleaned_spill_dirs.add(self.path)
+
+    def _remove_file(self, filename):
+        try:
+            os.remove(os.path.join(self.path, filename))
+        except OSError as e:
+            logging.warning(f"[Inspire Pack] SpillStore: failed to remove '{filename}': {e}")
+
+    def _drop(self, key):
+        # caller holds self._lock
+        filename, size, _ = self._index.pop(key)
+        self._usage -= size
+        return filename
+
+    def trim(self):
+        """Drop the least recently spilled entries until the directory fits in `max_bytes`."""
+        removed = []
+        with self._lock:
+            while self.max_bytes is not None and self._usage > self.max_bytes and self._index:
+                key = next(iter(self._index))
+                removed.append(self._drop(key))
+
+        for filename in removed:
+            self._remove_file(filename)
+
+    def store(self, key, value, load_time=None):
+        """
+        Spill a cache value (tag, (is_list, data)).
+        :return: False if the data can't be stored
+        """
+        filename = f"{next(self._seq):08d}{spill_suffix}"
+        try:
+            with self._lock:
+                self._prepare_dir()
+            size = write_entry(os.path.join(self.path, filename), value)
+        except NotStorable:
+            return False
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] SpillStore: failed to spill '{key}': {e}")
+            return False
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            self._remove_file(filename)
+            return False
+
+        old = None
+        with self._lock:
+            if key in self._index:
+                old = self._drop(key)
+            self._index[key] = filename, size, load_time
+            self._usage += size
+
+        if old is not None:
+            self._remove_file(old)
+
+        self.trim()
+        return True
+
+    def load(self, key):
+        """
+        Fault a spilled entry back in. The spill file is removed.
+        :return: (value, load_time) or None
+        """
+        with self._lock:
+            if key not in self._index:
+                return None
+            _, _, load_time = self._index[key]
+            filename = self._drop(key)
+
+        path = os.path.join(self.path, filename)
+        try:
+            value, _ = read_entry(path)
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] SpillStore: failed to load '{key}': {e}")
+            return None
+        finally:
+            self._remove_file(filename)
+
+        return value, load_time
+
+    def discard(self, key):
+        with self._lock:
+            if key not in self._index:
+                return
+            filename = self._drop(key)
+        self._remove_file(filename)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        with self._lock:
+            return list(self._index)
+
+    def get_usage(self):
+        """:return: (bytes, entry count)"""
+        with self._lock:
+            return self._usage, len(self._index)
+
+    def clear(self):
+        with self._lock:
+            filenames = [x[0] for x in self._index.values()]
+            self._index.clear()
+            self._usage = 0
+
+        for filename in filenames:
+            self._remove_file(filename)
+
+
+class PersistentStore:
+    """
+    Write-through disk store of TaggedCache entries that survives restarts.
+    The index (key, tag and version of every entry) is read from the file headers at startup. The data is loaded on
+    first access.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = {}  # key -> (filename, tag, version)
+        self._lock = threading.Lock()
+
+        if os.path.isdir(path):
+            for x in os.listdir(path):
+                if x.endswith('.safetensors') and not x.endswith(spill_suffix):
+                    try:
+                        with safe_open(os.path.join(path, x), framework="pt") as f:
+                            metadata = f.metadata()
+                        key = json.loads(metadata["inspire_key"])
+                        self._index[key] = x, metadata["inspire_tag"], json.loads(metadata["inspire_version"])
+                    except Exception as e:
+                        logging.warning(f"[Inspire Pack] PersistentStore: '{x}' is ignored. ({e})")
+
+    @staticmethod
+    def filename(key):
+        return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest() + '.safetensors'
+
+    def store(self, key, value, version=None):
+        """
+        Write a cache value (tag, (is_list, data)) through to disk.
+        :return: False if the data can't be stored
+        """
+        if not isinstance(key, (str, int)):
+            return False
+
+        filename = self.filename(key)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            write_entry(os.path.join(self.path, filename), value,
+                        metadata={"inspire_key": json.dumps(key), "inspire_version": json.dumps(version)})
+        except NotStorable as e:
+            logging.warning(f"[Inspire Pack] PersistentStore: '{key}' can't be persisted. ({e} is not supported)")
+            return False
+        except Exception as e:
+            logging.error(f"[Inspire Pack] PersistentStore: failed to persist '{key}': {e}")
+            return False
+
+        with self._lock:
+            self._index[key] = filename, value[0], version
+        return True
+
+    def load(self, key):
+        """:return: cache value (tag, (is_list, data)) or None"""
+        with self._lock:
+            if key not in self._index:
+                return None
+            filename = self._index[key][0]
+
+        try:
+            value, _ = read_entry(os.path.join(self.path, filename))
+            return value
+        except Exception as e:
+            logging.error(f"[Inspire Pack] PersistentStore: failed to load '{key}': {e}")
+            return None
+
+    def discard(self, key):
+        with self._lock:
+            item = self._index.pop(key, None)
+
+        if item is not None:
+            try:
+                os.remove(os.path.join(self.path, item[0]))
+            except OSError as e:
+                logging.warning(f"[Inspire Pack] PersistentStore: failed to remove '{item[0]}': {e}")
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def version(self, key):
+        with self._lock:
+            item = self._index.get(key)
+            return item[2] if item is not None else None
+
+    def versions(self):
+        """:return: {key: version}"""
+        with self._lock:
+            return {k: v[2] for k, v in self._index.items()}
+
+    def clear(self):
+        for key in list(self._index):
+            self.discard(key)
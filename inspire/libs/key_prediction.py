@@ -0,0 +1,79 @@
+"""
+Next-key prediction from the cache key sequences of past prompts.
+
+Workflows touch their cached models in a stable order (checkpoint, text encoder, LoRA, ...). Every prompt's access
+sequence is recorded, and a first-order Markov model counts the transitions between consecutive keys, including the one
+from the last key of a prompt to the first key of the next prompt. The successors of the key that was just accessed are
+predicted with their observed frequency.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+
+class KeySequencePredictor:
+    def __init__(self, max_keys=1024, max_sequences=32):
+        self.max_keys = max_keys
+        self._transitions = OrderedDict()  # key -> {next key: count}, least recently updated first
+        self._sequences = deque(maxlen=max_sequences)  # (prompt id, [key, ...]) of past prompts
+        self._prompt_id = None
+        self._current = []
+        self._last_key = None
+        self._lock = threading.Lock()
+
+    def _count(self, key, next_key):
+        # caller holds self._lock
+        successors = self._transitions.pop(key, {})
+        successors[next_key] = successors.get(next_key, 0) + 1
+        self._transitions[key] = successors
+        while len(self._transitions) > self.max_keys:
+            self._transitions.popitem(last=False)
+
+    def record(self, prompt_id, key):
+        """Record an access of `key` by the prompt `prompt_id`. Repeated accesses of the same key are recorded once."""
+        with self._lock:
+            if prompt_id != self._prompt_id:
+                if self._current:
+                    self._sequences.append((self._prompt_id, self._current))
+                self._prompt_id = prompt_id
+                self._current = []
+
+            if key == self._last_key:
+                return
+
+            if self._last_key is not None:
+                self._count(self._last_key, key)
+            self._last_key = key
+            if key not in self._current:
+                self._current.append(key)
+
+    def predict(self, key, min_probability=0.5, min_count=2, limit=2):
+        """:return: [(next key, probability), ...] most likely first"""
+        with self._lock:
+            successors = dict(self._transitions.get(key, {}))
+
+        total = sum(successors.values())
+        res = [(k, n / total) for k, n in successors.items() if n >= min_count and n / total >= min_probability]
+        res.sort(key=lambda x: x[1], reverse=True)
+        return res[:limit]
+
+    def get_sequences(self):
+        """:return: [{"prompt_id", "keys"}, ...] of the recent prompts, the current one last"""
+        with self._lock:
+            sequences = list(self._sequences)
+            if self._current:
+                sequences.append((self._prompt_id, self._current))
+            return [{"prompt_id": prompt_id, "keys": list(keys)} for prompt_id, keys in sequences]
+
+    def get_transitions(self):
+        """:return: {key: {next key: count}}"""
+        with self._lock:
+            return {k: dict(v) for k, v in self._transitions.items()}
+
+    def clear(self):
+        with self._lock:
+            self._transitions.clear()
+            self._sequences.clear()
+            self._prompt_id = None
+            self._current = []
+            self._last_key = None
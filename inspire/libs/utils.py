@@ -1,4 +1,7 @@
 import itertools
+import re
+import threading
+import time
 from typing import Optional
 import numpy as np
 import torch
@@ -7,6 +10,11 @@ import math
 import cv2
 import folder_paths
 import logging
+import os
+from .cache_policy import SimpleLRUCache, create_policy_cache  # noqa: F401
+from .cache_storage import PersistentStore, SpillStore
+from .weight_daemon import is_mapped
+from .weight_dedup import WeightDeduplicator
 
 
 def apply_variation_noise(latent_image, noise_device, variation_seed, variation_strength, mask=None, variation_method='linear'):
@@ -231,68 +239,868 @@ class ByPassTypeTuple(tuple):
         return item
 
 
+_size_units = {'': 1, 'B': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+priority_classes = {'low': -1, 'normal': 0, 'high': 1}
+
+
+def parse_priority_class(value):
+    """'low' | 'normal' | 'high' or an int. Entries of a lower class are evicted first."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid priority class: {value}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lower() in priority_classes:
+        return priority_classes[value.strip().lower()]
+    raise ValueError(f"Invalid priority class: {value} ({', '.join(priority_classes)} or int)")
+
+
+def parse_byte_size(value):
+    """
+    Parse a byte size such as 1073741824, "512MB" or "24 GiB" (binary units).
+    Returns None for unlimited (None, 0 or empty).
+    """
+    if value is None or value == '' or value == 0:
+        return None
+
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    m = re.fullmatch(r'\s*([0-9.]+)\s*([KMGT]?)(I?B)?\s*', str(value).upper())
+    if m is None:
+        raise ValueError(f"Invalid byte size: '{value}'")
+
+    return int(float(m.group(1)) * _size_units[m.group(2)])
+
+
+def format_byte_size(n):
+    if n is None:
+        return 'unlimited'
+
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(n) < 1024:
+            return f"{n:.1f}{unit}" if unit != 'B' else f"{n}B"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+host_weight_dtypes = ["fp8_e4m3fn", "fp8_e4m3fn_fast", "fp8_e5m2", "bf16", "fp16"]
+
+
+def weight_dtype_options(weight_dtype):
+    """model_options for a weight_dtype of UNETLoader, or of `host_weight_dtypes`"""
+    model_options = {}
+    if weight_dtype == "fp8_e4m3fn":
+        model_options["dtype"] = torch.float8_e4m3fn
+    elif weight_dtype == "fp8_e4m3fn_fast":
+        model_options["dtype"] = torch.float8_e4m3fn
+        model_options["fp8_optimizations"] = True
+    elif weight_dtype == "fp8_e5m2":
+        model_options["dtype"] = torch.float8_e5m2
+    elif weight_dtype == "bf16":
+        model_options["dtype"] = torch.bfloat16
+    elif weight_dtype == "fp16":
+        model_options["dtype"] = torch.float16
+    return model_options
+
+
+def get_memory_usage(obj, max_depth=8):
+    """
+    Measure the tensor memory reachable from `obj` (MODEL/CLIP/VAE patchers, nn.Module, tensors, and containers of them).
+    Storages shared between tensors are counted once.
+
+    :return: {device: bytes}  e.g. {'cpu': 4265146304, 'cuda:0': 335304388}
+             CPU tensors backed by a memory-mapped file are reported as 'mmap'.
+    """
+    usage = {}
+    seen_storages = set()
+    visited = set()
+
+    def add_tensor(t):
+        if t.device.type == 'meta':
+            return
+
+        try:
+            storage = t.untyped_storage()
+            storage_id = (str(t.device), storage.data_ptr())
+            nbytes = storage.nbytes()
+        except Exception:
+            storage_id = None
+            nbytes = t.element_size() * t.nelement()
+
+        if storage_id is not None:
+            if storage_id in seen_storages:
+                return
+            seen_storages.add(storage_id)
+
+        device = str(t.device)
+        if device == 'cpu' and storage_id is not None and is_mapped(storage_id[1]):
+            device = 'mmap'
+        usage[device] = usage.get(device, 0) + nbytes
+
+    stack = [(obj, 0)]
+    while stack:
+        o, depth = stack.pop()
+
+        if o is None or isinstance(o, (str, bytes, int, float, bool)) or id(o) in visited:
+            continue
+        visited.add(id(o))
+
+        if isinstance(o, torch.Tensor):
+            add_tensor(o)
+        elif isinstance(o, torch.nn.Module):
+            for t in itertools.chain(o.parameters(), o.buffers()):
+                add_tensor(t)
+        elif isinstance(o, dict):
+            stack.extend((x, depth+1) for x in o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend((x, depth+1) for x in o)
+        elif depth < max_depth and hasattr(o, '__dict__'):
+            # ModelPatcher.model, CLIP.cond_stage_model, VAE.first_stage_model, patches, ...
+            stack.extend((x, depth+1) for x in vars(o).values())
+
+    return usage
+
+
+def split_memory_usage(usage: dict):
+    """{device: bytes} -> (ram bytes, vram bytes). 'mmap' is page cache, which is neither."""
+    ram = sum(v for k, v in usage.items() if k == 'cpu')
+    vram = sum(v for k, v in usage.items() if k not in ['cpu', 'mmap'])
+    return ram, vram
+
+
+namespace_separator = '::'
+
+
+def namespace_key(namespace, key):
+    """Cache key of `key` in `namespace`. The default namespace ('') keeps the key as is."""
+    return f"{namespace}{namespace_separator}{key}" if namespace else key
+
+
+def split_namespace_key(key):
+    """:return: (namespace, key in the namespace)"""
+    if isinstance(key, str) and namespace_separator in key:
+        namespace, key = key.split(namespace_separator, 1)
+        return namespace, key
+    return '', key
+
+
+# built-in settings of tags, cache_settings.json overrides them per option
+default_tag_settings = {
+    "lora_sd": {"maxsize": 4, "max_bytes": "2GB"},  # raw LoRA tensors, a few recent files are enough to skip the disk reads
+}
+
+
+class CacheEntryInfo:
+    __slots__ = ('tag', 'namespace', 'ram', 'vram', 'devices', 'created', 'last_access', 'tick', 'hits', 'load_time', 'h_value', 'persistent', 'dedup', 'logical_bytes')
+
+    def __init__(self, tag, devices, load_time=None, persistent=False, dedup=None, logical_bytes=None, namespace=''):
+        self.tag = tag
+        self.namespace = namespace
+        self.logical_bytes = logical_bytes  # size of the data before compact storage (e.g. the model files), if known
+        self.dedup = dedup or {}  # {device: bytes} of weights shared with other entries
+        self.set_devices(devices)
+        self.created = time.time()
+        self.last_access = self.created
+        self.tick = 0
+        self.hits = 0
+        self.load_time = load_time  # seconds spent producing the data, if known
+        self.h_value = 0.0  # GreedyDual-Size H for the memory budget
+        self.persistent = persistent  # written through to the persistent store
+
+    def set_devices(self, devices):
+        # weights shared with other entries are counted by their owner (see WeightDeduplicator)
+        self.devices = {k: max(v - self.dedup.get(k, 0), 0) for k, v in devices.items()}  # {device: bytes}
+        self.ram, self.vram = split_memory_usage(self.devices)
+
+    @property
+    def size(self):
+        return self.ram + self.vram
+
+    @property
+    def slot(self):
+        # per-tag container of the entry, one per namespace
+        return (self.namespace, self.tag) if self.namespace else self.tag
+
+    @property
+    def cost_per_gb(self):
+        return (self.load_time or 0.0) / max(self.size, 1) * (1 << 30)
+
+    def to_dict(self):
+        return {
+            "tag": self.tag,
+            "namespace": self.namespace,
+            "size": self.size,
+            "ram": self.ram,
+            "vram": self.vram,
+            "devices": dict(self.devices),
+            "created": self.created,
+            "last_access": self.last_access,
+            "age": time.time() - self.created,
+            "hits": self.hits,
+            "load_time": self.load_time,
+            "persistent": self.persistent,
+            "dedup_bytes": sum(self.dedup.values()),
+            "resident_bytes": sum(self.devices.values()),
+            "logical_bytes": self.logical_bytes if self.logical_bytes is not None else sum(self.devices.values()),
+        }
+
+
 class TaggedCache:
+    """
+    Per-tag cache with pluggable eviction policies and an optional byte budget.
+
+    tag_settings (cache_settings.json):
+        "<tag>": <max entry count>
+        "<tag>": {"maxsize": <max entry count>, "max_bytes": <byte quota of the tag>,
+                  "policy": "lru" | "lfu" | "gds", "admission": "tinylfu",
+                  "priority_class": "low" | "normal" | "high" | <int>, "pinned": <pin every entry of the tag>}
+        "*": {"max_ram_bytes": <global RAM budget>, "max_vram_bytes": <global VRAM budget>, "policy": "lru" | "gds",
+              "pinned": [<key>, ...], "spill_dir": <directory>, "spill_max_bytes": <disk quota>, "persist_dir": <directory>,
+              "dedup_weights": true, "dedup_min_bytes": <smallest tensor to deduplicate>}
+        "<tag>": {"spill": false}  # don't spill the entries of the tag
+        "<tag>": {"persistent": true}  # write every entry of the tag through to the persistent store
+        "*": {"namespace_max_bytes": <byte quota of each namespace>, "namespaces": {"<namespace>": {"max_bytes": ...}}}
+
+    The tag policy picks the victim when the tag is full or over its byte quota (see cache_policy.py).
+    The "*" policy picks the victim across tags when the global budget is exceeded.
+    Pinned entries are never evicted, and lower priority classes are always evicted before higher ones.
+    Pinned bytes still count against the budget.
+
+    If "spill_dir" is set, evicted tensor data (latents, images, conditioning, ...) is spilled to disk and faulted back
+    in by `get`. Models can't be spilled.
+
+    Persistent entries are also written to "persist_dir" (default: <user directory>/inspire_backend_data) and survive
+    restarts. They are loaded back lazily by `get`.
+
+    Keys of the form "<namespace>::<key>" belong to a namespace (see `namespace_key`). Every namespace has its own
+    per-tag containers, so the entry count and byte quota of a tag apply per namespace, and a namespace over its byte
+    quota evicts only its own entries. Keys without a namespace belong to the default namespace, which has no quota.
+
+    If "dedup_weights" is set, CPU weights of a new entry that are identical to weights of a cached entry share their
+    storage (see weight_dedup.py). Shared bytes are counted by the entry that cached them first, and by one of the
+    remaining sharers once that entry is gone.
+    Byte sizes accept numbers or strings like "24GB".
+    All operations are thread-safe.
+    """
+
     def __init__(self, tag_settings: Optional[dict]=None):
         self._tag_settings = tag_settings or {}  # tag cache size
         self._data = {}
+        self._entries = {}  # key -> CacheEntryInfo, also the key -> tag index kept in sync with per-tag evictions
+        self._tick = 0
+        self._ram_usage = 0
+        self._vram_usage = 0
+        self._tag_usage = {}  # tag -> bytes
+        self._slot_usage = {}  # tag or (namespace, tag) -> bytes, for the tag quota
+        self._namespace_usage = {}  # namespace -> bytes
+        self._lock = threading.RLock()  # nodes and HTTP routes touch the cache from different threads
+        self._stats = {'hits': {}, 'misses': 0, 'inserts': {}, 'evictions': {}, 'rejections': {}, 'spills': {}, 'spill_hits': {}, 'store_hits': {}, 'offloads': {}}  # tag -> n, evictions: (tag, reason) -> n
+        self._inflation = 0.0  # GreedyDual-Size L for the memory budget
+
+        global_settings = self._tag_settings.get('*', {})
+        self._max_ram_bytes = parse_byte_size(global_settings.get('max_ram_bytes'))
+        self._max_vram_bytes = parse_byte_size(global_settings.get('max_vram_bytes'))
+        self._budget_policy = global_settings.get('policy', 'lru')
+        if self._budget_policy not in ['lru', 'gds']:
+            raise ValueError(f"Invalid budget policy '{self._budget_policy}'. (lru, gds)")
+
+        self._pinned_keys = set(global_settings.get('pinned', []))  # from the settings file
+        self._pin_overrides = {}  # key -> bool, set at runtime by nodes and the HTTP API
+        self._priority_overrides = {}  # key -> priority class, set at runtime
+
+        self._spill = None
+        self._spill_queue = []  # (key, value, load_time) evicted under the lock, written to disk after it is released
+        self._removed = []  # (key, value) that left memory under the lock, passed to the remove listeners after it is released
+        self._remove_listeners = []
+        if global_settings.get('spill_dir'):
+            spill_dir = os.path.abspath(os.path.expanduser(global_settings['spill_dir']))
+            self._spill = SpillStore(spill_dir, parse_byte_size(global_settings.get('spill_max_bytes')))
+
+        persist_dir = global_settings.get('persist_dir') or os.path.join(folder_paths.get_user_directory(), 'inspire_backend_data')
+        self._store = PersistentStore(os.path.abspath(os.path.expanduser(persist_dir)))
+
+        self._dedup = None
+        if global_settings.get('dedup_weights', False):
+            min_bytes = parse_byte_size(global_settings.get('dedup_min_bytes'))
+            self._dedup = WeightDeduplicator(os.path.join(self._store.path, 'weight_fingerprints.json'),
+                                             min_bytes=(1 << 20) if min_bytes is None else min_bytes)
+
+    def _tag_option(self, tag, name, default=None):
+        v = self._tag_settings.get(tag)
+        if isinstance(v, dict) and name in v:
+            return v[name]
+        elif name == 'maxsize' and v is not None and not isinstance(v, dict):
+            return v
+        return default_tag_settings.get(tag, {}).get(name, default)
+
+    def _eviction_class(self, key):
+        # None: pinned (not evictable), otherwise the priority class
+        entry = self._entries.get(key)
+        tag = entry.tag if entry is not None else None
+        if key in self._pin_overrides:
+            pinned = self._pin_overrides[key]
+        else:
+            pinned = key in self._pinned_keys or bool(self._tag_option(tag, 'pinned', False))
+        if pinned:
+            return None
+
+        if key in self._priority_overrides:
+            return self._priority_overrides[key]
+        return parse_priority_class(self._tag_option(tag, 'priority_class', 'normal'))
+
+    def _touch(self, entry):
+        self._tick += 1
+        entry.tick = self._tick
+        entry.last_access = time.time()
+        entry.h_value = self._inflation + entry.cost_per_gb
+
+    def _account(self, entry, sign):
+        self._ram_usage += sign * entry.ram
+        self._vram_usage += sign * entry.vram
+        self._tag_usage[entry.tag] = self._tag_usage.get(entry.tag, 0) + sign * entry.size
+        self._slot_usage[entry.slot] = self._slot_usage.get(entry.slot, 0) + sign * entry.size
+        self._namespace_usage[entry.namespace] = self._namespace_usage.get(entry.namespace, 0) + sign * entry.size
+
+    def _forget(self, key):
+        # drop bookkeeping of a key that has left its tag cache
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._account(entry, -1)
+        self._release_dedup(key, entry)
+        return entry.tag
+
+    def _release_dedup(self, key, entry):
+        # caller holds self._lock. The weights `entry` owned are charged to the sharers that take them over.
+        if self._dedup is None:
+            return
+
+        for (sharer_key, sharer), usage in self._dedup.release((key, entry)).items():
+            live = self._entries.get(sharer_key) is sharer
+            if live:
+                self._account(sharer, -1)
+            for device, nbytes in usage.items():
+                sharer.dedup[device] = max(sharer.dedup.get(device, 0) - nbytes, 0)
+                sharer.devices[device] = sharer.devices.get(device, 0) + nbytes
+            sharer.ram, sharer.vram = split_memory_usage(sharer.devices)
+            if live:
+                self._account(sharer, 1)
+
+    def _count(self, name, label):
+        self._stats[name][label] = self._stats[name].get(label, 0) + 1
+
+    def _queue_spill(self, key, value, entry):
+        if self._spill is not None and not entry.persistent and self._tag_option(entry.tag, 'spill', True):
+            self._spill_queue.append((key, value, entry.load_time))
+
+    def add_remove_listener(self, listener):
+        """`listener(key, value)` is called when a value leaves memory: evicted, removed, replaced or cleared."""
+        self._remove_listeners.append(listener)
+
+    def _flush_spill(self):
+        # write the queued evictions to disk and notify the remove listeners outside of the lock
+        with self._lock:
+            queue, self._spill_queue = self._spill_queue, []
+            removed, self._removed = self._removed, []
+
+        for key, value in removed:
+            for listener in self._remove_listeners:
+                try:
+                    listener(key, value)
+                except Exception as e:
+                    logging.warning(f"[Inspire Pack] TaggedCache: remove listener failed for '{key}': {e}")
+
+        for key, value, load_time in queue:
+            if key in self._entries:
+                continue  # cached again in the meantime
+            if self._spill.store(key, value, load_time):
+                with self._lock:
+                    self._count('spills', value[0])
+
+    def _on_evict(self, key, value):
+        self._queue_spill(key, value, self._entries[key])
+        self._removed.append((key, value))
+        tag = self._forget(key)
+        self._count('evictions', (tag, self._tag_option(tag, 'policy', 'lru')))
+
+    def _new_tag_cache(self, tag):
+        default_size = 20
+        if 'ckpt' in tag:
+            default_size = 5
+        elif tag in ['latent', 'image']:
+            default_size = 100
+
+        return create_policy_cache(self._tag_option(tag, 'policy', 'lru'), self._tag_option(tag, 'maxsize', default_size),
+                                   on_evict=self._on_evict, admission=self._tag_option(tag, 'admission'),
+                                   eviction_class=self._eviction_class)
+
+    def _evict(self, key, reason='budget'):
+        # L rises to the H of the evicted entry, so that entries which are not accessed age out
+        entry = self._entries[key]
+        self._inflation = max(self._inflation, entry.h_value)
+        tag = self._forget(key)
+        value = self._data[entry.slot].evict(key)
+        self._queue_spill(key, value, entry)
+        self._removed.append((key, value))
+        self._count('evictions', (tag, reason))
+        logging.info(f"[Inspire Pack] TaggedCache: '{key}' ({tag}) is evicted. ({reason})")
+
+    def _pick_victim(self, keys, protected_key):
+        classes = {k: self._eviction_class(k) for k in keys if k != protected_key}
+        classes = {k: v for k, v in classes.items() if v is not None}
+        if not classes:
+            return None
+
+        lowest = min(classes.values())
+        candidates = [k for k, v in classes.items() if v == lowest]
+
+        if self._budget_policy == 'gds':
+            return min(candidates, key=lambda k: (self._entries[k].h_value, self._entries[k].tick))
+        return min(candidates, key=lambda k: self._entries[k].tick)
+
+    def _namespace_quota(self, namespace):
+        if not namespace:
+            return None
+        global_settings = self._tag_settings.get('*', {})
+        v = global_settings.get('namespaces', {}).get(namespace, {}).get('max_bytes')
+        return parse_byte_size(v if v is not None else global_settings.get('namespace_max_bytes'))
+
+    def _enforce_budget(self, protected_key=None):
+        """
+        Evict entries until the budget, the tag quotas and the namespace quotas are satisfied.
+        The tag quota evicts through the tag policy, the namespace quota the way the budget does.
+        """
+
+        entry = self._entries.get(protected_key)
+        tag = entry.tag if entry is not None else None
+        max_tag_bytes = parse_byte_size(self._tag_option(tag, 'max_bytes')) if tag is not None else None
+        while max_tag_bytes is not None and self._slot_usage.get(entry.slot, 0) > max_tag_bytes:
+            victim = self._data[entry.slot].eviction_candidate(skip={protected_key})
+            if victim is None:
+                logging.warning(f"[Inspire Pack] TaggedCache: '{protected_key}' alone exceeds the byte quota of tag '{tag}'.")
+                break
+            self._evict(victim)
 
-    def __getitem__(self, key):
-        for tag_data in self._data.values():
-            if key in tag_data:
-                return tag_data[key]
-        raise KeyError(f'Key `{key}` does not exist')
+        max_namespace_bytes = self._namespace_quota(entry.namespace) if entry is not None else None
+        while max_namespace_bytes is not None and self._namespace_usage.get(entry.namespace, 0) > max_namespace_bytes:
+            victim = self._pick_victim([k for k, v in self._entries.items() if v.namespace == entry.namespace], protected_key)
+            if victim is None:
+                logging.warning(f"[Inspire Pack] TaggedCache: The byte quota of namespace '{entry.namespace}' is exceeded, but there is nothing left to evict.")
+                break
+            self._evict(victim, 'namespace')
 
-    def __setitem__(self, key, value: tuple):
-        # value: (tag: str, (islist: bool, data: *))
+        while True:
+            if self._max_ram_bytes is not None and self._ram_usage > self._max_ram_bytes:
+                keys = [k for k, v in self._entries.items() if v.ram > 0]
+            elif self._max_vram_bytes is not None and self._vram_usage > self._max_vram_bytes:
+                keys = [k for k, v in self._entries.items() if v.vram > 0]
+            else:
+                break
 
-        # if key already exists, pop old value
-        for tag_data in self._data.values():
-            if key in tag_data:
-                tag_data.pop(key, None)
+            victim = self._pick_victim(keys, protected_key)
+            if victim is None:
+                logging.warning(f"[Inspire Pack] TaggedCache: The memory budget is exceeded, but there is nothing left to evict. (pinned: {format_byte_size(sum(self.get_pinned_usage()))})")
                 break
+            self._evict(victim)
+
+    def release_memory(self, nbytes, memory='vram', offload=None, releasable=None):
+        """
+        Free about `nbytes` of 'ram' or 'vram' for the host application under memory pressure.
+        Entries are picked the way the global budget picks them, pinned entries are kept.
+        `offload(data)` can move an entry to the CPU instead of evicting it (True if it moved something). It runs without
+        the cache lock. Evicted entries are spilled if possible.
+        `releasable(data)` tells how many bytes evicting an entry actually frees, e.g. nothing while the host application
+        still references its models. Entries that free nothing are kept, the others are reported with what they free.
+
+        :return: [(key, tag, 'offload' | 'evict', released bytes), ...]
+        """
+        released = []
+        freed = 0
+        tried = set()
+
+        while freed < nbytes:
+            with self._lock:
+                keys = [k for k, v in self._entries.items() if (v.vram if memory == 'vram' else v.ram) > 0 and k not in tried]
+                victim = self._pick_victim(keys, None)
+                if victim is None:
+                    break
+
+                tried.add(victim)
+                entry = self._entries[victim]
+                data = self._data[entry.slot].peek(victim)[1][1]
+                before = entry.vram if memory == 'vram' else entry.ram
+
+            moved = memory == 'vram' and offload is not None and offload(data)
+
+            with self._lock:
+                if self._entries.get(victim) is not entry or self._data[entry.slot].peek(victim)[1][1] is not data:
+                    continue  # evicted or replaced meanwhile
+
+                if moved:
+                    self._remeasure(victim)
+                    self._count('offloads', entry.tag)
+                    if before > entry.vram:
+                        released.append((victim, entry.tag, 'offload', before - entry.vram))
+                        freed += before - entry.vram
+                    continue
+
+                nfreed = before if releasable is None else min(before, releasable(data))
+                if nfreed <= 0:
+                    continue
+                self._evict(victim, reason='pressure')
+                released.append((victim, entry.tag, 'evict', nfreed))
+                freed += nfreed
+
+        with self._lock:
+            self._enforce_budget()
+
+        self._flush_spill()
+        return released
+
+    def offload(self, key, offload):
+        """
+        Move the entry of `key` off the GPU with `offload(data)` (True if it moved something) and re-measure it.
+        `offload` runs without the cache lock, it may take the host application's locks.
+        :return: released VRAM bytes, or None if nothing was moved
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.vram == 0:
+                return None
+
+            before = entry.vram
+            data = self._data[entry.slot].peek(key)[1][1]
+
+        if not offload(data):
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._data[entry.slot].peek(key)[1][1] is not data:
+                # evicted or replaced meanwhile
+                return None
+
+            self._remeasure(key)
+            self._count('offloads', entry.tag)
+            released = before - entry.vram
+            self._enforce_budget()
+
+        self._flush_spill()
+        return released
+
+    def evict(self, key, reason='manual'):
+        """
+        Evict `key` as the policy would, spilling it if possible. Pinned keys are kept.
+        :return: True if it was evicted
+        """
+        with self._lock:
+            if key not in self._entries or self._eviction_class(key) is None:
+                return False
+            self._evict(key, reason)
+
+        self._flush_spill()
+        return True
+
+    def _remeasure(self, key):
+        entry = self._entries[key]
+        self._account(entry, -1)
+        entry.set_devices(get_memory_usage(self._data[entry.slot].peek(key)[1]))
+        self._account(entry, 1)
+
+    def refresh_memory_usage(self):
+        """Re-measure every entry. Models can move between devices after they are cached."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remeasure(key)
+
+            self._enforce_budget()
+
+        self._flush_spill()
+
+    def get_memory_budget(self):
+        """:return: (max ram bytes, max vram bytes), None means unlimited"""
+        return self._max_ram_bytes, self._max_vram_bytes
+
+    def get_memory_usage(self):
+        """:return: (ram bytes, vram bytes, {tag: bytes})"""
+        with self._lock:
+            return self._ram_usage, self._vram_usage, dict(self._tag_usage)
+
+    def get_namespace_usage(self):
+        """:return: {namespace: (bytes, entry count, byte quota or None)}"""
+        with self._lock:
+            counts = {}
+            for v in self._entries.values():
+                counts[v.namespace] = counts.get(v.namespace, 0) + 1
+            return {ns: (self._namespace_usage.get(ns, 0), n, self._namespace_quota(ns)) for ns, n in counts.items()}
+
+    def get_pinned_usage(self):
+        """:return: (pinned ram bytes, pinned vram bytes)"""
+        with self._lock:
+            pinned = [v for k, v in self._entries.items() if self._eviction_class(k) is None]
+            return sum(v.ram for v in pinned), sum(v.vram for v in pinned)
+
+    def is_pinned(self, key):
+        with self._lock:
+            return self._eviction_class(key) is None
+
+    def peek(self, key):
+        """The in-memory value of `key`, without counting an access. None if it isn't in memory."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return self._data[entry.slot].peek(key) if entry is not None else None
+
+    def is_resident(self, key):
+        """True if `key` is in memory, not only spilled or persisted."""
+        return key in self._entries
+
+    def set_pinned(self, key, pinned=True):
+        """Pin or unpin `key`. The key doesn't need to be cached yet."""
+        with self._lock:
+            self._pin_overrides[key] = pinned
+            if not pinned:
+                self._enforce_budget()
+
+        self._flush_spill()
+
+    def set_priority_class(self, key, priority_class):
+        """Set the priority class of `key`. None restores the tag default."""
+        with self._lock:
+            if priority_class is None:
+                self._priority_overrides.pop(key, None)
+            else:
+                self._priority_overrides[key] = parse_priority_class(priority_class)
+            self._enforce_budget()
+
+        self._flush_spill()
+
+    def inherit_state(self, other):
+        """Take over the stats, the runtime pins/priority classes and the spilled entries of the cache this one replaces."""
+        self._stats = other._stats
+        self._remove_listeners = list(other._remove_listeners)
+        self._pin_overrides = dict(other._pin_overrides)
+        self._priority_overrides = dict(other._priority_overrides)
+
+        if other._spill is not None:
+            if self._spill is not None and self._spill.path == other._spill.path:
+                other._spill.max_bytes = self._spill.max_bytes
+                self._spill = other._spill
+                self._spill.trim()
+            else:
+                other._spill.clear()
+
+        if self._store.path == other._store.path:
+            self._store = other._store
+
+        if self._dedup is not None and other._dedup is not None:
+            self._dedup.inherit(other._dedup)
+
+    def get_persisted_versions(self):
+        """:return: {key: version} of the persistent store"""
+        return self._store.versions()
+
+    def get_dedup_usage(self):
+        """:return: bytes of cached weights that are shared instead of copied, or None if deduplication is disabled"""
+        if self._dedup is None:
+            return None
+        with self._lock:
+            return sum(sum(v.dedup.values()) for v in self._entries.values())
+
+    def get_spill_usage(self):
+        """:return: (spilled bytes, spilled entry count, disk quota) or None if spilling is disabled"""
+        if self._spill is None:
+            return None
+        return *self._spill.get_usage(), self._spill.max_bytes
+
+    def get_stats(self):
+        """:return: {'hits': {tag: n}, 'misses': n, 'inserts': {tag: n}, 'evictions': {(tag, reason): n}, 'rejections': {tag: n}, 'spills': {tag: n}, 'spill_hits': {tag: n}, 'store_hits': {tag: n}, 'offloads': {tag: n}, 'entries': {tag: n}}"""
+        with self._lock:
+            stats = {k: dict(v) if isinstance(v, dict) else v for k, v in self._stats.items()}
+            stats['entries'] = {}
+            for slot, tag_data in self._data.items():
+                tag = slot[1] if isinstance(slot, tuple) else slot
+                stats['entries'][tag] = stats['entries'].get(tag, 0) + len(tag_data)
+            return stats
+
+    def get_inventory(self):
+        """:return: [{"key", "tag", "size", "ram", "vram", "devices", "created", "last_access", "age", "hits", "load_time", "persistent", "dedup_bytes", "resident_bytes", "logical_bytes", "pinned", "priority_class"}, ...]"""
+        with self._lock:
+            res = []
+            for k, v in self._entries.items():
+                eviction_class = self._eviction_class(k)
+                res.append({"key": k, **v.to_dict(), "pinned": eviction_class is None, "priority_class": eviction_class})
+            return res
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+        self._touch(entry)
+        entry.hits += 1
+        self._count('hits', entry.tag)
+        return self._data[entry.slot][key]
+
+    def _fault_in(self, key):
+        # bring a spilled or persisted entry back from disk
+        if self._spill is not None and key in self._spill:
+            res = self._spill.load(key)
+            if res is not None:
+                value, load_time = res
+                with self._lock:
+                    self._count('spill_hits', value[0])
+                logging.info(f"[Inspire Pack] TaggedCache: '{key}' ({value[0]}) is loaded from the spill directory.")
+                self.put(key, value, load_time=load_time)
+                return value
+
+        if key in self._store:
+            value = self._store.load(key)
+            if value is not None:
+                with self._lock:
+                    self._count('store_hits', value[0])
+                logging.info(f"[Inspire Pack] TaggedCache: '{key}' ({value[0]}) is loaded from the persistent store.")
+                self._insert(key, value, None, persistent=True)
+                return value
+
+        return None
 
-        tag = value[0]
-        if tag not in self._data:
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(f'Key `{key}` does not exist')
+        return value
+
+    def put(self, key, value: tuple, load_time=None, persistent=None, version=None, logical_bytes=None, write_through=True):
+        """
+        value: (tag: str, (islist: bool, data: *))
+        persistent: write through to the persistent store. None: the tag setting, or stay persistent if the key already is.
+        write_through: False if the caller already wrote the entry with `persist`, which returned `persistent`
+        version: stored with a persistent entry, so that `cache_count` of the key survives restarts
+        logical_bytes: size of the data before compact storage (e.g. the model files), reported by the inventory
+        :return: False if the admission filter of the tag rejected the key
+        """
+        if write_through:
+            persistent = self.persist(key, value, persistent, version)
+        return self._insert(key, value, load_time, bool(persistent), logical_bytes)
+
+    def persist(self, key, value: tuple, persistent=None, version=None):
+        """
+        The write-through part of `put`. Callers that hold a lock of their own can write to disk before taking it, and
+        then `put` with write_through=False.
+        :return: True if the entry is persistent
+        """
+        if persistent is None:
+            persistent = bool(self._tag_option(value[0], 'persistent', False)) or key in self._store
+
+        if persistent:
+            if version is None:
+                version = self._store.version(key)
+            return self._store.store(key, value, version)
+
+        self._store.discard(key)
+        return False
 
-            try:
-                from cachetools import LRUCache
+    def _insert(self, key, value, load_time, persistent, logical_bytes=None):
+        entry = CacheEntryInfo(value[0], {}, load_time, persistent, None, logical_bytes, namespace=split_namespace_key(key)[0])
+        if self._dedup is not None:
+            entry.dedup = self._dedup.deduplicate(value[1], owner=(key, entry))
+            if entry.dedup:
+                logging.info(f"[Inspire Pack] TaggedCache: '{key}' ({value[0]}) shares {format_byte_size(sum(entry.dedup.values()))} of weights with other entries.")
+        entry.set_devices(get_memory_usage(value[1]))
+
+        with self._lock:
+            # if key already exists, pop old value
+            old = self._entries.get(key)
+            if self._forget(key) is not None:
+                self._removed.append((key, self._data[old.slot].pop(key)))
+
+            tag = value[0]
+            if entry.slot not in self._data:
+                self._data[entry.slot] = self._new_tag_cache(tag)
+            admitted = self._data[entry.slot].put(key, value, cost=load_time, size=entry.size)
+            if not admitted:
+                self._release_dedup(key, entry)
+                self._count('rejections', tag)
+                logging.info(f"[Inspire Pack] TaggedCache: '{key}' ({tag}) is not admitted. It is not requested often enough yet.")
+            else:
+                self._entries[key] = entry
+                self._touch(entry)
+                self._count('inserts', tag)
+                self._account(entry, 1)
 
-                default_size = 20
-                if 'ckpt' in tag:
-                    default_size = 5
-                elif tag in ['latent', 'image']:
-                    default_size = 100
+                self._enforce_budget(protected_key=key)
 
-                self._data[tag] = LRUCache(maxsize=self._tag_settings.get(tag, default_size))
+        if admitted and self._spill is not None:
+            self._spill.discard(key)
+        self._flush_spill()
+        return admitted
 
-            except (ImportError, ModuleNotFoundError):
-                # TODO: implement a simple lru dict
-                self._data[tag] = {}
-        self._data[tag][key] = value
+    def __setitem__(self, key, value: tuple):
+        self.put(key, value)
 
     def __delitem__(self, key):
-        for tag_data in self._data.values():
-            if key in tag_data:
-                del tag_data[key]
-                return
-        raise KeyError(f'Key `{key}` does not exist')
+        on_disk = key in self._store or (self._spill is not None and key in self._spill)
+        self._store.discard(key)
+        if self._spill is not None:
+            self._spill.discard(key)
+        if on_disk and key not in self._entries:
+            return
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._forget(key) is None:
+                raise KeyError(f'Key `{key}` does not exist')
+            self._removed.append((key, self._data[entry.slot].pop(key)))
+
+        self._flush_spill()
 
     def __contains__(self, key):
-        return any(key in tag_data for tag_data in self._data.values())
+        return key in self._entries or key in self._store or (self._spill is not None and key in self._spill)
+
+    def keys(self):
+        """Every key, in memory, spilled or persisted."""
+        with self._lock:
+            keys = set(self._entries)
+        keys.update(self._store.versions())
+        if self._spill is not None:
+            keys.update(self._spill.keys())
+        return list(keys)
 
     def items(self):
-        yield from itertools.chain(*map(lambda x :x.items(), self._data.values()))
+        with self._lock:
+            items = list(itertools.chain(*map(lambda x :x.items(), self._data.values())))
+        yield from items
 
     def get(self, key, default=None):
         """D.get(k[,d]) -> D[k] if k in D, else d.  d defaults to None."""
-        for tag_data in self._data.values():
-            if key in tag_data:
-                return tag_data[key]
-        return default
+        with self._lock:
+            value = self._lookup(key)
+
+        if value is None:
+            value = self._fault_in(key)
+        return default if value is None else value
 
     def clear(self):
         # clear all cache
-        self._data = {}
+        with self._lock:
+            self._removed.extend(itertools.chain(*map(lambda x: x.items(), self._data.values())))
+            self._data = {}
+            self._entries = {}
+            if self._dedup is not None:
+                self._dedup.clear()
+            self._ram_usage = 0
+            self._vram_usage = 0
+            self._tag_usage = {}
+            self._slot_usage = {}
+            self._namespace_usage = {}
+            self._spill_queue = []
+
+        self._flush_spill()
+        if self._spill is not None:
+            self._spill.clear()
+        self._store.clear()
 
 
 def make_3d_mask(mask):
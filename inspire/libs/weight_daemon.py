@@ -0,0 +1,451 @@
+"""
+Host-RAM weight sharing between ComfyUI processes on the same machine.
+
+The daemon copies model files (.safetensors) into a shared memory directory (/dev/shm) and hands out their paths.
+Every process maps the same copy, so the weights are held in host RAM once instead of once per process and are not
+re-read from the model disk.
+
+protocol: one JSON object per line, over a Unix socket ("unix:/tmp/inspire_weights.sock") or localhost TCP
+("tcp:127.0.0.1:8390").
+    {"op": "acquire", "path": <model file>} -> {"ok": true, "shm_path": ..., "size": n} | {"ok": false, "error": ...}
+    {"op": "release", "path": <model file>} -> {"ok": true}
+    {"op": "status"} -> {"ok": true, "files": [{"path", "shm_path", "size", "refs", "last_used"}, ...], "usage", "max_bytes"}
+
+Only files under the allowed directories (the ComfyUI model directories, passed with --allow-dir) are shared.
+References are owned by the connection and dropped when it closes. Files without references are removed first when
+the shared memory budget is exceeded. The budget defaults to half of the shared memory filesystem. Processes that still map a removed file keep using it until they unmap it.
+
+run: python weight_daemon.py --address unix:/tmp/inspire_weights.sock --shm-dir /dev/shm/inspire_weights --max-bytes 64GB \
+                            --allow-dir /path/to/ComfyUI/models
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+
+default_address = "unix:/tmp/inspire_weights.sock"
+default_shm_dir = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "inspire_weights")
+daemon_log_file = os.path.join(tempfile.gettempdir(), "inspire_weight_daemon.log")
+
+
+def parse_address(address):
+    """'unix:<path>' | 'tcp:<host>:<port>' -> (family, address)"""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    elif address.startswith("tcp:"):
+        host, port = address[len("tcp:"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+
+    raise ValueError(f"Invalid daemon address '{address}'. ('unix:<path>' or 'tcp:<host>:<port>')")
+
+
+default_shm_fraction = 0.5  # of the shared memory filesystem, if no budget is given
+shm_file_pattern = re.compile(r'[0-9a-f]{40}\.safetensors(\.tmp)?')  # names of the copies the daemon writes
+
+
+def is_under(path, dirs):
+    path = os.path.abspath(path)
+    return any(os.path.commonpath([path, os.path.abspath(d)]) == os.path.abspath(d) for d in dirs)
+
+
+class WeightStore:
+    def __init__(self, shm_dir, max_bytes=None, allowed_dirs=()):
+        self.shm_dir = shm_dir
+        self.allowed_dirs = list(allowed_dirs)
+        self._files = {}  # source path -> {"shm_path", "size", "refs", "last_used", "stamp"}
+        self._usage = 0
+        self._lock = threading.Lock()
+        self._copy_locks = {}  # source path -> Lock, one copy per file at a time
+
+        os.makedirs(shm_dir, exist_ok=True)
+        for x in os.listdir(shm_dir):
+            # leftovers of a previous daemon. Files of other programs are left alone.
+            if shm_file_pattern.fullmatch(x) and os.path.isfile(os.path.join(shm_dir, x)):
+                os.remove(os.path.join(shm_dir, x))
+
+        # tmpfs is host RAM
+        self.max_bytes = max_bytes if max_bytes is not None else int(shutil.disk_usage(shm_dir).total * default_shm_fraction)
+
+    def _evict_for(self, size):
+        # caller holds self._lock
+        while self.max_bytes is not None and self._usage + size > self.max_bytes:
+            idle = [(v["last_used"], k) for k, v in self._files.items() if v["refs"] == 0 and v["ready"]]
+            if not idle:
+                return False
+            _, path = min(idle)
+            self._remove(path)
+        return True
+
+    def _remove(self, path):
+        # caller holds self._lock
+        item = self._files.pop(path)
+        self._usage -= item["size"]
+        try:
+            os.remove(item["shm_path"])
+        except OSError:
+            pass
+        logging.info(f"[Inspire Pack] weight daemon: '{path}' is removed from shared memory.")
+
+    def acquire(self, path):
+        if not path.endswith(".safetensors"):
+            raise ValueError("only .safetensors files can be shared")
+        if not is_under(path, self.allowed_dirs):
+            raise ValueError("only files under the model directories can be shared")
+
+        st = os.stat(path)
+        stamp = st.st_size, st.st_mtime_ns
+
+        with self._lock:
+            copy_lock = self._copy_locks.setdefault(path, threading.Lock())
+
+        with copy_lock:
+            with self._lock:
+                item = self._files.get(path)
+                if item is not None and item["stamp"] != stamp:
+                    self._remove(path)  # the model file has changed
+                    item = None
+
+                if item is None:
+                    if not self._evict_for(st.st_size):
+                        raise MemoryError("the shared memory budget is full of files in use")
+                    name = hashlib.sha1(f"{path}:{stamp}".encode('utf-8')).hexdigest() + ".safetensors"
+                    shm_path = os.path.join(self.shm_dir, name)
+                    item = {"shm_path": shm_path, "size": st.st_size, "refs": 0, "last_used": time.time(), "stamp": stamp, "ready": False}
+                    self._files[path] = item
+                    self._usage += st.st_size
+
+            if not item["ready"]:
+                try:
+                    start = time.perf_counter()
+                    shutil.copyfile(path, item["shm_path"] + ".tmp")
+                    os.replace(item["shm_path"] + ".tmp", item["shm_path"])
+                    logging.info(f"[Inspire Pack] weight daemon: '{path}' is copied to shared memory. ({time.perf_counter() - start:.1f}s)")
+                except BaseException:
+                    with self._lock:
+                        self._remove(path)
+                    raise
+                item["ready"] = True
+
+            with self._lock:
+                item["refs"] += 1
+                item["last_used"] = time.time()
+                return {"shm_path": item["shm_path"], "size": item["size"]}
+
+    def release(self, path):
+        with self._lock:
+            item = self._files.get(path)
+            if item is not None and item["refs"] > 0:
+                item["refs"] -= 1
+                item["last_used"] = time.time()
+
+    def status(self):
+        with self._lock:
+            files = [{"path": k, "shm_path": v["shm_path"], "size": v["size"], "refs": v["refs"], "last_used": v["last_used"]}
+                     for k, v in self._files.items()]
+            return {"files": files, "usage": self._usage, "max_bytes": self.max_bytes}
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        acquired = []
+
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    req = json.loads(line)
+                    op = req.get("op")
+                    if op == "acquire":
+                        res = {"ok": True, **store.acquire(req["path"])}
+                        acquired.append(req["path"])
+                    elif op == "release":
+                        if req["path"] in acquired:
+                            acquired.remove(req["path"])
+                            store.release(req["path"])
+                        res = {"ok": True}
+                    elif op == "status":
+                        res = {"ok": True, **store.status()}
+                    else:
+                        res = {"ok": False, "error": f"unknown op '{op}'"}
+                except Exception as e:
+                    res = {"ok": False, "error": str(e)}
+
+                self.wfile.write((json.dumps(res) + "\n").encode('utf-8'))
+                self.wfile.flush()
+        finally:
+            for path in acquired:
+                store.release(path)
+
+
+class UnixDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPDaemonServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def is_daemon_alive(address):
+    family, addr = parse_address(address)
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as s:
+            s.settimeout(1)
+            s.connect(addr)
+        return True
+    except OSError:
+        return False
+
+
+def serve(address, shm_dir, max_bytes=None, allowed_dirs=()):
+    if is_daemon_alive(address):
+        logging.info(f"[Inspire Pack] weight daemon: another daemon is already serving '{address}'.")
+        return
+
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            os.remove(addr)  # stale socket
+        server = UnixDaemonServer(addr, DaemonHandler)
+    else:
+        server = TCPDaemonServer(addr, DaemonHandler)
+
+    server.store = WeightStore(shm_dir, max_bytes, allowed_dirs)
+    logging.info(f"[Inspire Pack] weight daemon: serving '{address}' with '{shm_dir}'.")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.remove(addr)
+
+
+def spawn_daemon(address, shm_dir, max_bytes=None, allowed_dirs=()):
+    args = [sys.executable, os.path.abspath(__file__), "--address", address, "--shm-dir", shm_dir]
+    if max_bytes is not None:
+        args += ["--max-bytes", str(max_bytes)]
+    for x in allowed_dirs:
+        args += ["--allow-dir", x]
+    with open(daemon_log_file, 'ab') as log:
+        subprocess.Popen(args, start_new_session=True, stdin=subprocess.DEVNULL, stdout=log, stderr=log)
+
+
+class WeightDaemonClient:
+    """Connection of this process to the weight daemon. The references it holds live as long as the connection."""
+
+    def __init__(self, address, autostart=False, shm_dir=default_shm_dir, max_bytes=None, allowed_dirs=(), connect_timeout=15):
+        self.address = address
+        self._sock = None
+        self._rfile = None
+        self._lock = threading.Lock()
+        self._acquired = {}  # model path -> number of references held by this connection
+
+        if autostart and not is_daemon_alive(address):
+            logging.info(f"[Inspire Pack] weight daemon: starting a daemon at '{address}'.")
+            spawn_daemon(address, shm_dir, max_bytes, allowed_dirs)
+
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self._connect()
+                break
+            except OSError:
+                if not autostart or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _connect(self):
+        family, addr = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(addr)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._rfile = sock.makefile('rb')
+
+    def request(self, req):
+        with self._lock:
+            self._sock.sendall((json.dumps(req) + "\n").encode('utf-8'))
+            line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("the weight daemon closed the connection")
+        return json.loads(line)
+
+    def acquire(self, path):
+        """
+        :return: path of the shared memory copy of `path`, or None if the daemon can't share it
+        Every call takes a reference, which is held until `release`. The daemon checks the file stamp on every call,
+        so a changed model file gets a fresh copy.
+        """
+        path = os.path.abspath(path)
+        res = self.request({"op": "acquire", "path": path})
+        if not res.get("ok"):
+            logging.warning(f"[Inspire Pack] weight daemon: '{path}' is not shared. ({res.get('error')})")
+            return None
+
+        with self._lock:
+            self._acquired[path] = self._acquired.get(path, 0) + 1
+        return res["shm_path"]
+
+    def release(self, path):
+        """Drop one reference taken by `acquire`."""
+        path = os.path.abspath(path)
+        with self._lock:
+            refs = self._acquired.get(path, 0)
+            if refs == 0:
+                return
+            if refs == 1:
+                del self._acquired[path]
+            else:
+                self._acquired[path] = refs - 1
+        self.request({"op": "release", "path": path})
+
+    def status(self):
+        return self.request({"op": "status"})
+
+    def close(self):
+        if self._sock is not None:
+            self._rfile.close()
+            self._sock.close()
+            self._sock = None
+
+
+safetensors_dtypes = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+    "U16": "uint16", "U32": "uint32", "U64": "uint64",
+    "F8_E4M3": "float8_e4m3fn", "F8_E5M2": "float8_e5m2", "F8_E8M0": "float8_e8m0fnu",
+}
+
+
+class UnsupportedDtypeError(ValueError):
+    """A tensor of the file has a dtype this torch build can't map. The file is to be loaded normally."""
+
+
+mapped_regions = {}  # id(mmap) -> (start address, end address, source) of the live mappings of `map_safetensors`
+
+
+def is_mapped(ptr):
+    """True if `ptr` points into a file mapping, i.e. page cache rather than anonymous RAM."""
+    return any(start <= ptr < end for start, end, _ in list(mapped_regions.values()))
+
+
+def mapped_source(ptr):
+    """:return: (source, offset) if `ptr` points into a mapping of `map_safetensors`, otherwise None"""
+    for start, end, source in list(mapped_regions.values()):
+        if start <= ptr < end:
+            return source, ptr - start
+    return None
+
+
+def map_safetensors(path, source=None):
+    """
+    Map a .safetensors file into a state dict without reading it. The tensors are backed by a copy-on-write mapping of
+    the file: pages are only read when touched, and every mapping of the same file (in this or another process) shares
+    them until they are written to.
+
+    source: the file whose content `path` holds (e.g. the original of a shared memory copy). default: `path`
+            "<path>:<size>:<mtime>" of it identifies the content of the mapping. (see `mapped_source`)
+
+    :return: (state dict, metadata)
+    :raises UnsupportedDtypeError: if a tensor has a dtype that can't be mapped
+    """
+    import torch
+
+    source = source or path
+    st = os.stat(source)
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    start = torch.frombuffer(mm, dtype=torch.uint8).data_ptr()
+    mapped_regions[id(mm)] = start, start + len(mm), f"{os.path.abspath(source)}:{st.st_size}:{st.st_mtime_ns}"
+    weakref.finalize(mm, mapped_regions.pop, id(mm), None)
+
+    header_size = int.from_bytes(mm[:8], 'little')
+    header = json.loads(mm[8:8 + header_size])
+    metadata = header.pop("__metadata__", None)
+
+    sd = {}
+    for name, info in header.items():
+        dtype = getattr(torch, safetensors_dtypes.get(info["dtype"], ''), None)
+        if not isinstance(dtype, torch.dtype):
+            raise UnsupportedDtypeError(f"'{name}' has an unsupported dtype {info['dtype']}")
+        begin, end = info["data_offsets"]
+        if begin == end:
+            sd[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        t = torch.frombuffer(mm, dtype=dtype, count=(end - begin) // dtype.itemsize, offset=8 + header_size + begin)
+        sd[name] = t.reshape(info["shape"])
+
+    return sd, metadata
+
+
+def attach_shared_weights(modules, sd):
+    """
+    Point the CPU parameters and buffers of `modules` that are identical to a tensor of `sd` at that tensor, so that
+    they use the shared mapping instead of a private copy. Tensors are matched by the tail of their names, then
+    verified by shape, dtype and content.
+
+    :return: attached bytes
+    """
+    import torch
+
+    index = {}
+    for k, v in sd.items():
+        index.setdefault(tuple(k.split('.')[-3:]), []).append(v)
+
+    attached = 0
+    for module in modules:
+        if module is None:
+            continue
+        for name, t in itertools.chain(module.named_parameters(), module.named_buffers()):
+            if t.device.type != 'cpu':
+                continue
+            for candidate in index.get(tuple(name.split('.')[-3:]), []):
+                if candidate.dtype == t.dtype and candidate.shape == t.shape and torch.equal(candidate, t.data):
+                    t.data = candidate
+                    attached += t.numel() * t.element_size()
+                    break
+
+    return attached
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    size_units = {'': 1, 'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30, 'TB': 1 << 40}
+
+    def byte_size(value):
+        # same format as parse_byte_size of utils.py, which can't be imported without ComfyUI
+        m = re.fullmatch(r'\s*([0-9.]+)\s*([KMGT]?B?)\s*', value.upper())
+        if m is None:
+            raise argparse.ArgumentTypeError(f"invalid byte size: {value}")
+        return int(float(m.group(1)) * size_units[m.group(2)])
+
+    parser = argparse.ArgumentParser(description="Inspire Pack weight daemon")
+    parser.add_argument("--address", default=default_address)
+    parser.add_argument("--shm-dir", default=default_shm_dir)
+    parser.add_argument("--max-bytes", type=byte_size, default=None)
+    parser.add_argument("--allow-dir", action="append", default=[], help="directory whose model files can be shared (repeatable)")
+    args = parser.parse_args()
+
+    serve(args.address, args.shm_dir, args.max_bytes, args.allow_dir)
@@ -0,0 +1,209 @@
+"""
+Content-hash deduplication of model weights across TaggedCache entries.
+
+Fine-tunes of the same base often carry byte-identical tensors (VAE, text encoders). When a model is cached, every CPU
+parameter and buffer is fingerprinted with a sampled hash of its content plus its shape and dtype. Tensors with a known
+fingerprint are compared in full, and identical ones are pointed at the storage that is already cached.
+
+Every shared tensor is counted by one owner, at first the entry that cached it. When the owner leaves the cache, one of
+the remaining sharers becomes the owner and is charged for it. The deduplicator holds the shared tensors while any
+entry uses them.
+
+Fingerprints of tensors mapped from a file (see weight_daemon.map_safetensors) are persisted by file, size, mtime and
+offset, so that caching the same file again doesn't read its pages just for hashing.
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+
+import torch
+
+from .weight_daemon import is_mapped, mapped_source
+
+
+sample_count = 1024
+max_saved_fingerprints = 200000
+
+
+def sampled_hash(t):
+    """Hash of `sample_count` evenly spaced elements of `t`, its shape and its dtype."""
+    flat = t.detach().reshape(-1)
+    n = flat.numel()
+    if n > sample_count:
+        flat = flat[torch.arange(sample_count) * (n - 1) // (sample_count - 1)]
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{t.dtype}:{tuple(t.shape)}:".encode('utf-8'))
+    h.update(flat.contiguous().view(torch.uint8).numpy().tobytes())
+    return h.hexdigest()
+
+
+def iter_modules(obj, max_depth=8):
+    """nn.Modules reachable from `obj`, the same way `get_memory_usage` walks it."""
+    visited = set()
+    stack = [(obj, 0)]
+    while stack:
+        o, depth = stack.pop()
+
+        if o is None or isinstance(o, (str, bytes, int, float, bool, torch.Tensor)) or id(o) in visited:
+            continue
+        visited.add(id(o))
+
+        if isinstance(o, torch.nn.Module):
+            yield o
+        elif isinstance(o, dict):
+            stack.extend((x, depth+1) for x in o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend((x, depth+1) for x in o)
+        elif depth < max_depth and hasattr(o, '__dict__'):
+            stack.extend((x, depth+1) for x in vars(o).values())
+
+
+class WeightDeduplicator:
+    def __init__(self, fingerprint_file=None, min_bytes=1 << 20):
+        self.fingerprint_file = fingerprint_file
+        self.min_bytes = min_bytes
+        self._canonical = {}  # fingerprint -> data pointer of the tensor that others share
+        self._shared = {}  # data pointer -> {"tensor", "fingerprint", "device", "nbytes", "owner", "sharers"}
+        self._by_owner = {}  # owner -> {data pointer, ...} it owns or shares
+        self._saved = {}  # "<source>:<offset>:<dtype>:<shape>" -> fingerprint, of mapped tensors
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if fingerprint_file is not None and os.path.exists(fingerprint_file):
+            try:
+                with open(fingerprint_file) as f:
+                    self._saved = json.load(f)
+            except Exception as e:
+                logging.warning(f"[Inspire Pack] WeightDeduplicator: '{fingerprint_file}' is ignored. ({e})")
+
+    def fingerprint(self, t):
+        source = mapped_source(t.data_ptr())
+        saved_key = f"{source[0]}:{source[1]}:{t.dtype}:{tuple(t.shape)}" if source is not None else None
+
+        with self._lock:
+            fingerprint = self._saved.get(saved_key) if saved_key is not None else None
+        if fingerprint is not None:
+            return fingerprint
+
+        fingerprint = sampled_hash(t)
+        if saved_key is not None:
+            with self._lock:
+                self._saved[saved_key] = fingerprint
+                self._dirty = True
+        return fingerprint
+
+    def inherit(self, other):
+        """Take over the fingerprints of the deduplicator this one replaces. Cached entries register again when re-inserted."""
+        with other._lock:
+            self._saved = {**other._saved, **self._saved}
+
+    def _save(self):
+        with self._lock:
+            if not self._dirty or self.fingerprint_file is None:
+                return
+            if len(self._saved) > max_saved_fingerprints:
+                self._saved = dict(itertools.islice(self._saved.items(), len(self._saved) - max_saved_fingerprints, None))
+            saved = dict(self._saved)
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.fingerprint_file), exist_ok=True)
+            tmp_path = self.fingerprint_file + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.fingerprint_file)
+        except Exception as e:
+            logging.warning(f"[Inspire Pack] WeightDeduplicator: failed to save fingerprints: {e}")
+
+    def deduplicate(self, obj, owner):
+        """
+        Point the CPU weights of `obj` that are identical to an already known tensor at that tensor's storage.
+        owner: hashable token of the cache entry of `obj`, until `release(owner)`
+
+        :return: {device: bytes} of weights counted by other owners ('cpu' or 'mmap', as in `get_memory_usage`)
+        """
+        shared = {}
+        seen = set()
+
+        for module in iter_modules(obj):
+            for t in itertools.chain(module.parameters(), module.buffers()):
+                if id(t) in seen or t.device.type != 'cpu' or t.is_sparse:
+                    continue
+                seen.add(id(t))
+
+                if t.numel() * t.element_size() < self.min_bytes or not t.is_contiguous():
+                    continue
+
+                with self._lock:
+                    item = self._shared.get(t.data_ptr())  # already shared, e.g. re-inserted
+                if item is None:
+                    fingerprint = self.fingerprint(t)
+                    with self._lock:
+                        item = self._shared.get(self._canonical.get(fingerprint))
+                        if item is None:
+                            item = self._register(t, fingerprint, owner)
+
+                    canonical = item["tensor"]
+                    if canonical is not t and canonical.dtype == t.dtype and canonical.shape == t.shape and torch.equal(canonical, t):
+                        t.data = canonical.data
+                    elif canonical is not t:
+                        continue  # fingerprint collision or a different dtype, keep the own copy
+
+                with self._lock:
+                    if self._shared.get(item["tensor"].data_ptr()) is not item:
+                        item = self._register(t, item["fingerprint"], owner)  # its owner left meanwhile
+                    if item["owner"] != owner and owner not in item["sharers"]:
+                        item["sharers"].add(owner)
+                        self._by_owner.setdefault(owner, set()).add(item["tensor"].data_ptr())
+                        shared[item["device"]] = shared.get(item["device"], 0) + item["nbytes"]
+
+        self._save()
+        return shared
+
+    def _register(self, t, fingerprint, owner):
+        # caller holds self._lock
+        ptr = t.data_ptr()
+        item = {"tensor": t, "fingerprint": fingerprint, "device": 'mmap' if is_mapped(ptr) else 'cpu',
+                "nbytes": t.numel() * t.element_size(), "owner": owner, "sharers": set()}
+        self._shared[ptr] = item
+        self._canonical[fingerprint] = ptr
+        self._by_owner.setdefault(owner, set()).add(ptr)
+        return item
+
+    def release(self, owner):
+        """
+        Unregister the cache entry `owner`. The tensors it owned are handed to one of their sharers, or dropped.
+        :return: {new owner: {device: bytes}} that the new owners are to be charged for
+        """
+        charged = {}
+        with self._lock:
+            for ptr in self._by_owner.pop(owner, ()):
+                item = self._shared.get(ptr)
+                if item is None:
+                    continue
+
+                item["sharers"].discard(owner)
+                if item["owner"] != owner:
+                    continue
+
+                if item["sharers"]:
+                    item["owner"] = item["sharers"].pop()
+                    usage = charged.setdefault(item["owner"], {})
+                    usage[item["device"]] = usage.get(item["device"], 0) + item["nbytes"]
+                else:
+                    del self._shared[ptr]
+                    if self._canonical.get(item["fingerprint"]) == ptr:
+                        del self._canonical[item["fingerprint"]]
+
+        return charged
+
+    def clear(self):
+        with self._lock:
+            self._canonical.clear()
+            self._shared.clear()
+            self._by_owner.clear()
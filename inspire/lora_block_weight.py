@@ -14,6 +14,7 @@ import logging
 
 from server import PromptServer
 from .libs import utils
+from . import backend_support
 
 
 model_path = folder_paths.models_dir
@@ -84,23 +85,8 @@ class MakeLBW:
 
     DESCRIPTION = "Instead of directly applying the LoRA Block Weight to the MODEL, it is generated in a separate LBW_MODEL form."
 
-    def __init__(self):
-        self.loaded_lora = None
-
     def doit(self, model, clip, lora_name, inverse, seed, A, B, preset, block_vector, bypass=False, category_filter=None):
-        lora_path = folder_paths.get_full_path("loras", lora_name)
-        lora = None
-        if self.loaded_lora is not None:
-            if self.loaded_lora[0] == lora_path:
-                lora = self.loaded_lora[1]
-            else:
-                temp = self.loaded_lora
-                self.loaded_lora = None
-                del temp
-
-        if lora is None:
-            lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-            self.loaded_lora = (lora_path, lora)
+        lora = backend_support.load_lora_file(lora_name)
 
         block_weights, muted_weights, populated_vector = LoraLoaderBlockWeight.load_lbw(model, clip, lora, inverse, seed, A, B, block_vector)
         lbw_model = {
@@ -111,9 +97,6 @@ class MakeLBW:
 
 
 class LoraLoaderBlockWeight:
-    def __init__(self):
-        self.loaded_lora = None
-
     @classmethod
     def INPUT_TYPES(s):
         preset = ["Preset"]  # 20
@@ -492,24 +475,18 @@ class LoraLoaderBlockWeight:
         if strength_model == 0 and strength_clip == 0 or bypass:
             return model, clip, ""
 
-        lora_path = folder_paths.get_full_path("loras", lora_name)
-        lora = None
-        if self.loaded_lora is not None:
-            if self.loaded_lora[0] == lora_path:
-                lora = self.loaded_lora[1]
-            else:
-                temp = self.loaded_lora
-                self.loaded_lora = None
-                del temp
-
-        if lora is None:
-            lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
-            self.loaded_lora = (lora_path, lora)
+        lora = backend_support.load_lora_file(lora_name)
 
         model_lora, clip_lora, populated_vector = LoraLoaderBlockWeight.load_lora_for_models(model, clip, lora, strength_model, strength_clip, inverse, seed, A, B, block_vector)
         return model_lora, clip_lora, populated_vector
 
 
+apply_lbw_bake_patches_tooltip = (backend_support.bake_patches_tooltip + "\n"
+                                  "The output of this node is not a cache entry: the baked weights are computed every time the node runs "
+                                  "and are only kept as long as ComfyUI keeps the node's output. The input model is not modified. "
+                                  "To keep baked weights across prompts, bake in 'Shared Lora Loader' instead.")
+
+
 class ApplyLBW:
     @classmethod
     def INPUT_TYPES(s):
@@ -519,6 +496,9 @@ class ApplyLBW:
                     "strength_model": ("FLOAT", {"default": 1.0, "min": -10.0, "max": 10.0, "step": 0.01}),
                     "strength_clip": ("FLOAT", {"default": 1.0, "min": -10.0, "max": 10.0, "step": 0.01}),
                     "lbw_model": ("LBW_MODEL",),
+                },
+                "optional": {
+                    "bake_patches": ("BOOLEAN", {"default": False, "tooltip": apply_lbw_bake_patches_tooltip}),
                 }}
 
     RETURN_TYPES = ("MODEL", "CLIP")
@@ -529,7 +509,7 @@ class ApplyLBW:
     DESCRIPTION = "Apply LBW_MODEL to MODEL and CLIP"
 
     @staticmethod
-    def doit(model, clip, strength_model, strength_clip, lbw_model):
+    def doit(model, clip, strength_model, strength_clip, lbw_model, bake_patches=False):
         block_weights = lbw_model['blocks']
         muted_weights = lbw_model['muted']
 
@@ -548,6 +528,10 @@ class ApplyLBW:
             else:
                 new_modelpatcher.add_patches({k: weights}, strength_model * ratio)
 
+        if bake_patches:
+            new_modelpatcher = backend_support.bake_model_patches(new_modelpatcher)
+            new_clip.patcher = backend_support.bake_model_patches(new_clip.patcher)
+
         return new_modelpatcher, new_clip
 
 
@@ -978,9 +962,7 @@ class LoraBlockInfo:
         return text
 
     def doit(self, model, clip, lora_name, block_info, unique_id):
-        lora_path = folder_paths.get_full_path("loras", lora_name)
-
-        lora = comfy.utils.load_torch_file(lora_path, safe_load=True)
+        lora = backend_support.load_lora_file(lora_name)
         text = LoraBlockInfo.extract_info(model, clip, lora)
 
         PromptServer.instance.send_sync("inspire-node-feedback", {"node_id": unique_id, "widget_name": "block_info", "type": "text", "data": text})
@@ -137,17 +137,16 @@ class IPAdapterModelHelper:
         if clipvision is not None:
             if cache_mode in ["clip_vision only", "all"]:
                 ccache_key = clipvision
-                if ccache_key not in backend_support.cache:
-                    backend_support.update_cache(ccache_key, "clipvision", (False, nodes.CLIPVisionLoader().load_clip(clip_name=clipvision)[0]))
-                _, (_, clipvision) = backend_support.cache[ccache_key]
+                clip_name = clipvision
+                _, clipvision, _ = backend_support.load_shared(ccache_key, "clipvision", lambda: nodes.CLIPVisionLoader().load_clip(clip_name=clip_name)[0], name="IPAdapterModelHelper")
             else:
                 clipvision = nodes.CLIPVisionLoader().load_clip(clip_name=clipvision)[0]
 
         if lora is not None:
-            model, clip = nodes.LoraLoader().load_lora(model=model, clip=clip, lora_name=lora, strength_model=lora_strength_model, strength_clip=lora_strength_clip)
+            model, clip = backend_support.apply_lora(model, clip, lora, lora_strength_model, lora_strength_clip)
 
             def f(x):
-                return nodes.LoraLoader().load_lora(model=x, clip=clip, lora_name=lora, strength_model=lora_strength_model, strength_clip=lora_strength_clip)
+                return backend_support.apply_lora(x, clip, lora, lora_strength_model, lora_strength_clip)
             lora_loader = f
         else:
             def f(x):
@@ -167,9 +166,7 @@ class IPAdapterModelHelper:
 
             if cache_mode in ["insightface only", "all"]:
                 icache_key = 'insightface-' + insightface_provider
-                if icache_key not in backend_support.cache:
-                    backend_support.update_cache(icache_key, "insightface", (False, insight_face_loader(provider=insightface_provider, model_name=insightface_model_name)[0]))
-                _, (_, insightface) = backend_support.cache[icache_key]
+                _, insightface, _ = backend_support.load_shared(icache_key, "insightface", lambda: insight_face_loader(provider=insightface_provider, model_name=insightface_model_name)[0], name="IPAdapterModelHelper")
             else:
                 insightface = insight_face_loader(insightface_provider)[0]
 
@@ -0,0 +1,68 @@
+"""
+The Inspire Pack runs inside ComfyUI. When the tests run outside of it, the host modules the backend cache imports
+(folder_paths, comfy, nodes, server) are replaced by minimal stand-ins, so the cache can be tested without a GPU or
+model files.
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+
+def install_host_stubs():
+    try:
+        import folder_paths  # noqa: F401
+        return  # running inside ComfyUI
+    except ImportError:
+        pass
+
+    user_dir = tempfile.mkdtemp(prefix="inspire_test_user_")
+
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.models_dir = os.path.join(user_dir, "models")
+    folder_paths.folder_names_and_paths = {}
+    folder_paths.get_user_directory = lambda: user_dir
+    folder_paths.get_filename_list = lambda folder_name: []
+    folder_paths.get_folder_paths = lambda folder_name: []
+    folder_paths.get_full_path = lambda folder_name, filename: None
+    folder_paths.get_full_path_or_raise = lambda folder_name, filename: os.path.join(folder_paths.models_dir, folder_name, filename)
+    folder_paths.add_model_folder_path = lambda folder_name, full_folder_path, is_default=False: None
+    sys.modules["folder_paths"] = folder_paths
+
+    comfy = types.ModuleType("comfy")
+    for name in ["lora", "model_management", "sd", "utils", "samplers", "float"]:
+        module = types.ModuleType(f"comfy.{name}")
+        setattr(comfy, name, module)
+        sys.modules[f"comfy.{name}"] = module
+    sys.modules["comfy"] = comfy
+
+    mm = comfy.model_management
+    mm.current_loaded_models = []
+    mm.free_memory = lambda memory_required, device, keep_loaded=[]: None
+    mm.get_free_memory = lambda dev=None, torch_free_too=False: 0
+    mm.get_total_memory = lambda dev=None, torch_total_too=False: 0
+    mm.soft_empty_cache = lambda force=False: None
+    mm.get_torch_device = lambda: "cpu"
+    comfy.samplers.SCHEDULER_HANDLERS = {}
+    comfy.samplers.SCHEDULER_NAMES = []
+    comfy.samplers.KSampler = types.SimpleNamespace(SAMPLERS=[], SCHEDULERS=[])
+
+    nodes = types.ModuleType("nodes")
+    nodes.NODE_CLASS_MAPPINGS = {}
+    for name in ["CheckpointLoaderSimple", "UNETLoader", "LoraLoaderModelOnly", "CLIPVisionLoader", "VAELoader"]:
+        setattr(nodes, name, type(name, (), {}))
+    sys.modules["nodes"] = nodes
+
+    class PromptServer:
+        instance = types.SimpleNamespace(client_id=None, last_prompt_id=None, send_sync=lambda *args, **kwargs: None)
+
+    server = types.ModuleType("server")
+    server.PromptServer = PromptServer
+    sys.modules["server"] = server
+
+
+install_host_stubs()
@@ -0,0 +1,139 @@
+import pytest
+
+from inspire.libs.cache_policy import SimpleLRUCache, create_policy_cache
+
+
+def fill(cache, keys, **kwargs):
+    for k in keys:
+        cache.put(k, k.upper(), **kwargs)
+
+
+def test_lru_evicts_least_recently_used():
+    evicted = []
+    cache = create_policy_cache('lru', 3, on_evict=lambda k, v: evicted.append((k, v)))
+    fill(cache, 'abc')
+
+    cache['a']
+    cache.put('d', 'D')
+
+    assert evicted == [('b', 'B')]
+    assert sorted(cache.keys()) == ['a', 'c', 'd']
+
+
+def test_lru_contains_and_peek_do_not_refresh():
+    cache = create_policy_cache('lru', 2)
+    fill(cache, 'ab')
+
+    assert 'a' in cache
+    assert cache.peek('a') == 'A'
+    cache.put('c', 'C')
+
+    assert 'a' not in cache
+
+
+def test_lfu_evicts_least_frequently_used_then_least_recent():
+    cache = create_policy_cache('lfu', 3)
+    fill(cache, 'abc')
+    cache['a']
+    cache['a']
+    cache['b']
+
+    cache.put('d', 'D')
+    assert 'c' not in cache
+
+    # b and d: b was used more often
+    cache.put('e', 'E')
+    assert 'd' not in cache
+    assert sorted(cache.keys()) == ['a', 'b', 'e']
+
+
+def test_gds_keeps_entries_expensive_to_load_per_byte():
+    cache = create_policy_cache('gds', 2)
+    cache.put('slow', 1, cost=10.0, size=1 << 30)
+    cache.put('fast', 2, cost=1.0, size=1 << 30)
+
+    cache.put('new', 3, cost=5.0, size=1 << 30)
+
+    assert 'fast' not in cache
+    assert 'slow' in cache and 'new' in cache
+
+
+def test_gds_ages_out_entries_that_are_not_accessed():
+    cache = create_policy_cache('gds', 2)
+    cache.put('old', 1, cost=2.0, size=1 << 30)
+    for i in range(3):
+        cache.put(f'k{i}', i, cost=1.5, size=1 << 30)
+
+    # the inflation value rises with every eviction, so 'old' finally loses to newer, cheaper entries
+    assert 'old' not in cache
+
+
+def test_pinned_keys_are_never_evicted():
+    pinned = {'a'}
+    cache = create_policy_cache('lru', 2, eviction_class=lambda k: None if k in pinned else 1)
+    fill(cache, 'ab')
+
+    cache.put('c', 'C')
+
+    assert 'a' in cache and 'b' not in cache
+
+
+def test_every_key_pinned_grows_past_maxsize():
+    cache = create_policy_cache('lru', 2, eviction_class=lambda k: None)
+    fill(cache, 'abc')
+
+    assert len(cache) == 3
+
+
+def test_lower_priority_class_is_evicted_first():
+    classes = {'low': 0, 'high': 2}
+    cache = create_policy_cache('lru', 2, eviction_class=lambda k: classes.get(k, 1))
+    cache.put('low', 1)
+    cache.put('high', 2)
+    cache['low']
+
+    cache.put('normal', 3)
+
+    assert 'low' not in cache
+    assert cache.eviction_candidate() == 'normal'
+
+
+def test_tinylfu_rejects_one_off_keys_until_they_are_requested_often():
+    cache = create_policy_cache('lru', 2, admission='tinylfu')
+    fill(cache, 'ab')
+    for _ in range(3):
+        cache['a']
+        cache['b']
+
+    assert cache.put('c', 'C') is False
+    assert 'c' not in cache and len(cache) == 2
+
+    admitted = any(cache.put('c', 'C') for _ in range(10))
+    assert admitted and 'c' in cache
+
+
+def test_unknown_policy_and_admission():
+    with pytest.raises(ValueError):
+        create_policy_cache('fifo', 2)
+    with pytest.raises(ValueError):
+        create_policy_cache('lru', 2, admission='bloom')
+
+
+def test_simple_lru_cache():
+    evicted = []
+    cache = SimpleLRUCache(2, on_evict=lambda k, v: evicted.append(k))
+    cache[1] = 'a'
+    cache[2] = 'b'
+    cache[1]
+    cache[3] = 'c'
+
+    assert evicted == [2]
+    assert list(cache) == [1, 3]
+
+
+def test_simple_lru_cache_unbounded():
+    cache = SimpleLRUCache(None)
+    for i in range(100):
+        cache[i] = i
+
+    assert len(cache) == 100
@@ -0,0 +1,63 @@
+from inspire.libs.key_prediction import KeySequencePredictor
+
+
+def record_prompt(predictor, prompt_id, keys):
+    for key in keys:
+        predictor.record(prompt_id, key)
+
+
+def test_predicts_the_usual_successor():
+    predictor = KeySequencePredictor()
+    record_prompt(predictor, 'p1', ['ckpt', 'clip', 'lora'])
+    record_prompt(predictor, 'p2', ['ckpt', 'clip', 'lora'])
+
+    assert predictor.predict('ckpt') == [('clip', 1.0)]
+    assert predictor.predict('clip') == [('lora', 1.0)]
+
+
+def test_counts_the_transition_to_the_next_prompt():
+    predictor = KeySequencePredictor()
+    record_prompt(predictor, 'p1', ['a', 'b'])
+    record_prompt(predictor, 'p2', ['a', 'b'])
+    record_prompt(predictor, 'p3', ['a'])
+
+    assert predictor.get_transitions()['b'] == {'a': 2}
+
+
+def test_needs_enough_observations_and_probability():
+    predictor = KeySequencePredictor()
+    record_prompt(predictor, 'p1', ['a', 'b'])
+    assert predictor.predict('a') == []
+
+    record_prompt(predictor, 'p2', ['a', 'c'])
+    record_prompt(predictor, 'p3', ['a', 'c'])
+    record_prompt(predictor, 'p4', ['a', 'c'])
+    assert predictor.predict('a') == [('c', 0.75)]
+    assert predictor.predict('a', min_probability=0.9) == []
+
+
+def test_repeated_accesses_are_recorded_once():
+    predictor = KeySequencePredictor()
+    record_prompt(predictor, 'p1', ['a', 'a', 'b', 'b'])
+
+    assert predictor.get_transitions() == {'a': {'b': 1}}
+    assert predictor.get_sequences() == [{"prompt_id": 'p1', "keys": ['a', 'b']}]
+
+
+def test_keeps_at_most_max_keys():
+    predictor = KeySequencePredictor(max_keys=2)
+    record_prompt(predictor, 'p1', ['a', 'b', 'c', 'd'])
+
+    assert list(predictor.get_transitions()) == ['b', 'c']
+
+
+def test_sequences_of_recent_prompts():
+    predictor = KeySequencePredictor(max_sequences=2)
+    for i in range(4):
+        record_prompt(predictor, f'p{i}', [f'k{i}'])
+
+    # the last two finished prompts and the current one
+    assert [x['prompt_id'] for x in predictor.get_sequences()] == ['p1', 'p2', 'p3']
+
+    predictor.clear()
+    assert predictor.get_sequences() == [] and predictor.get_transitions() == {}
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from inspire import backend_support
+from inspire.libs.utils import TaggedCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(backend_support, 'cache', TaggedCache({}))
+    monkeypatch.setattr(backend_support, 'cache_count', {})
+    monkeypatch.setattr(backend_support, 'loading_futures', {})
+
+
+def load_concurrently(loader, n=8):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+    errors = [None] * n
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = backend_support.load_shared('model', 'ckpt', loader, record_access=False)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+
+    return results, errors
+
+
+def test_concurrent_callers_share_one_load():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results, errors = load_concurrently(loader)
+
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    assert len({id(data) for _, data, _ in results}) == 1
+    assert [loaded for _, _, loaded in results].count(True) == 1
+    assert all(tag == 'ckpt' for tag, _, _ in results)
+    assert backend_support.loading_futures == {}
+
+
+def test_cached_data_is_not_loaded_again():
+    tag, data, loaded = backend_support.load_shared('model', 'ckpt', object, record_access=False)
+    assert loaded
+
+    def loader():
+        raise AssertionError("loaded twice")
+
+    assert backend_support.load_shared('model', 'ckpt', loader, record_access=False) == (tag, data, False)
+
+
+def test_override_reloads():
+    _, first, _ = backend_support.load_shared('model', 'ckpt', object, record_access=False)
+    _, second, loaded = backend_support.load_shared('model', 'ckpt', object, override=True, record_access=False)
+
+    assert loaded and second is not first
+    assert backend_support.cache_count[backend_support.scoped_key('model')] == 1
+
+
+def test_a_failed_load_reaches_every_waiter_and_can_be_retried():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("broken model")
+
+    results, errors = load_concurrently(loader)
+
+    assert len(calls) == 1
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert backend_support.loading_futures == {}
+    assert 'model' not in backend_support.cache
+
+    _, data, loaded = backend_support.load_shared('model', 'ckpt', lambda: 'ok', record_access=False)
+    assert loaded and data == 'ok'
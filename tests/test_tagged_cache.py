@@ -0,0 +1,70 @@
+import torch
+
+from inspire.libs.utils import TaggedCache
+
+MB = 1 << 20
+
+
+def tensor_mb(n=1):
+    return torch.zeros(n * MB // 4, dtype=torch.float32)
+
+
+def put(cache, key, tag='latent', n=1):
+    cache.put(key, (tag, (False, tensor_mb(n))))
+
+
+def test_global_ram_budget_evicts_least_recently_used():
+    cache = TaggedCache({"*": {"max_ram_bytes": 3 * MB}})
+    for key in 'abc':
+        put(cache, key)
+    cache.get('a')
+
+    put(cache, 'd')
+
+    assert sorted(cache.keys()) == ['a', 'c', 'd']
+    assert cache.get_memory_usage()[0] == 3 * MB
+    assert cache.get_stats()['evictions'] == {('latent', 'budget'): 1}
+
+
+def test_global_ram_budget_evicts_across_tags():
+    cache = TaggedCache({"*": {"max_ram_bytes": "4MB"}})
+    put(cache, 'a', tag='latent', n=2)
+    put(cache, 'b', tag='image', n=2)
+
+    put(cache, 'c', tag='image', n=3)
+
+    assert cache.keys() == ['c']
+    ram, vram, tag_usage = cache.get_memory_usage()
+    assert ram == 3 * MB and vram == 0
+    assert tag_usage.get('latent', 0) == 0 and tag_usage['image'] == 3 * MB
+
+
+def test_tag_byte_quota():
+    cache = TaggedCache({"latent": {"max_bytes": 2 * MB}})
+    for key in 'abc':
+        put(cache, key)
+    put(cache, 'x', tag='image', n=4)
+
+    assert sorted(cache.keys()) == ['b', 'c', 'x']
+    assert cache.get_memory_usage()[2]['latent'] == 2 * MB
+
+
+def test_pinned_keys_stay_within_the_budget():
+    cache = TaggedCache({"*": {"max_ram_bytes": 2 * MB}})
+    cache.set_pinned('a')
+    for key in 'abcd':
+        put(cache, key)
+
+    assert sorted(cache.keys()) == ['a', 'd']
+    assert cache.get_pinned_usage() == (MB, 0)
+
+
+def test_replacing_a_key_releases_its_bytes():
+    cache = TaggedCache({})
+    put(cache, 'a', n=2)
+    put(cache, 'a', n=1)
+
+    assert cache.get_memory_usage()[0] == MB
+
+    del cache['a']
+    assert cache.get_memory_usage()[0] == 0